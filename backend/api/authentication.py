@@ -0,0 +1,33 @@
+from hashlib import sha256
+
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from foodgram.settings import TOKEN_CACHE_TIMEOUT
+
+
+def get_token_cache_key(key):
+    """
+    В ключе кеша хранится хеш токена, а не сам токен.
+    """
+    return 'auth-token:' + sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(keys):
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кешированием пользователя по токену.
+    Кеш сбрасывается сигналами при удалении токена (выход из системы)
+    и при изменении или удалении пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials, TOKEN_CACHE_TIMEOUT)
+        return credentials
@@ -0,0 +1,46 @@
+import time
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+
+def get_cache_version(name):
+    """
+    Текущая версия закешированных данных.
+    """
+    key = f'{name}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(name):
+    """
+    Смена версии делает недействительными все ранее закешированные данные.
+    """
+    key = f'{name}:version'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_request_cache_key(name, request):
+    """
+    Ключ кеша по версии данных, пути и отсортированным параметрам запроса.
+    Путь с параметрами хешируется, чтобы ключ подходил для memcached.
+    """
+    query = urlencode(sorted(
+        (param, value)
+        for param, values in request.query_params.lists()
+        for value in values
+    ))
+    path = md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'{name}:{get_cache_version(name)}:{path}'
+
+
+def get_etag(content):
+    return '"%s"' % md5(content).hexdigest()
@@ -1,9 +1,14 @@
 from distutils.util import strtobool
 
 import django_filters
+from django.db.models import Exists, OuterRef
 from rest_framework import filters
 
-from recipes.models import Recipe
+from foodgram.settings import INGREDIENTS_SEARCH_LIMIT
+from recipes.models import Recipe, TagRecipe
+from recipes.search import search_recipes
+from .indexes import ingredient_index
+from .utils import get_tag_ids
 
 CHOICES = (
     ('0', 'False'),
@@ -11,10 +16,18 @@ CHOICES = (
 )
 
 
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
+
+
 class RecipeFilter(django_filters.FilterSet):
 
+    search = django_filters.CharFilter(method='get_search')
     author = django_filters.CharFilter(field_name='author__id')
-    tags = django_filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = django_filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags'
+    )
     is_favorited = django_filters.TypedChoiceFilter(
         choices=CHOICES,
         coerce=strtobool,
@@ -29,7 +42,28 @@ class RecipeFilter(django_filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('search', 'tags', 'author', 'is_favorited',
+                  'is_in_shopping_cart')
+
+    def get_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию с сортировкой
+        по релевантности.
+        """
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
+    def get_tags(self, queryset, name, value):
+        """
+        Рецепты хотя бы с одним из тегов. Проверка через EXISTS
+        не размножает строки и не требует DISTINCT.
+        """
+        tag_ids = get_tag_ids()
+        return queryset.annotate(has_tags=Exists(TagRecipe.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[tag_ids[slug] for slug in value if slug in tag_ids]
+        ))).filter(has_tags=True)
 
     def get_is_favorited(self, queryset, name, value):
 
@@ -45,5 +79,15 @@ class RecipeFilter(django_filters.FilterSet):
 
 
 class IngredientFilter(filters.SearchFilter):
-
+    """
+    Поиск продуктов по началу названия через индекс в памяти.
+    Индекс возвращает список, поэтому он применяется только к списку
+    продуктов, а получение одного продукта идёт по queryset.
+    """
     search_param = 'name'
+
+    def filter_queryset(self, request, queryset, view):
+        prefix = request.query_params.get(self.search_param, '')
+        if getattr(view, 'action', None) != 'list' or not prefix.strip():
+            return queryset
+        return ingredient_index.search(prefix, INGREDIENTS_SEARCH_LIMIT)
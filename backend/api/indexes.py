@@ -0,0 +1,64 @@
+import sys
+from bisect import bisect_left, bisect_right
+from threading import Lock
+
+from recipes.models import Ingredient
+from .cache import get_cache_version
+
+
+def normalize(name):
+    """
+    Приведение названия продукта к виду для поиска.
+    """
+    return ' '.join(name.casefold().split())
+
+
+class IngredientIndex:
+    """
+    Отсортированный индекс названий продуктов в памяти процесса.
+    Перестраивается, когда меняется версия кеша продуктов.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._data = None
+
+    def build(self, version):
+        entries = sorted(
+            (normalize(ingredient.name), ingredient.id, ingredient)
+            for ingredient in Ingredient.objects.all()
+        )
+        self._data = (
+            version,
+            [entry[0] for entry in entries],
+            [entry[2] for entry in entries],
+        )
+        return self._data
+
+    def get_data(self):
+        version = get_cache_version('ingredients')
+        data = self._data
+        if data is None or data[0] != version:
+            with self._lock:
+                data = self._data
+                if data is None or data[0] != version:
+                    data = self.build(version)
+        return data
+
+    def search(self, prefix, limit=None):
+        """
+        Поиск продуктов по началу названия.
+
+        Точное совпадение всегда идёт первым, так как в отсортированном
+        индексе префикс стоит раньше всех строк, которые с него начинаются.
+        """
+        _, keys, ingredients = self.get_data()
+        prefix = normalize(prefix)
+        start = bisect_left(keys, prefix)
+        end = bisect_right(keys, prefix + chr(sys.maxunicode), lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return ingredients[start:end]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,206 @@
+import base64
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.management.seed import seed_dataset
+from users.models import Subscribe
+
+
+def get_image():
+    buffer = BytesIO()
+    Image.new('RGB', (800, 600), (200, 120, 40)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(share * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер эндпоинтов API на временной базе '
+            'с синтетическими данными, результат в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=1000, type=int)
+        parser.add_argument('--recipes', default=20000, type=int)
+        parser.add_argument('--ingredients', default=2000, type=int)
+        parser.add_argument('--tags', default=10, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=10, type=int)
+        parser.add_argument('--favorites-per-user', default=50, type=int)
+        parser.add_argument('--carts-per-user', default=10, type=int)
+        parser.add_argument('--subscriptions-per-user', default=20, type=int)
+        parser.add_argument('--repeat', default=100, type=int)
+        parser.add_argument('--seed', default=0, type=int)
+        parser.add_argument('--output', help='Файл для результата.')
+
+    def get_scenarios(self, data, rng):
+        """
+        Сценарии: название и функция, выполняющая один запрос.
+        """
+        image = get_image()
+        ingredients = data['ingredients']
+        tags = data['tags']
+        own_recipes = []
+
+        def recipe_payload():
+            return {
+                'name': 'Рецепт для замера',
+                'text': 'Описание рецепта',
+                'cooking_time': rng.randint(1, 120),
+                'image': image,
+                'tags': rng.sample(tags, min(2, len(tags))),
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': rng.randint(1, 500)}
+                    for ingredient_id in rng.sample(
+                        ingredients, min(10, len(ingredients)))
+                ],
+            }
+
+        def create(client):
+            response = client.post('/api/recipes/', recipe_payload(),
+                                   format='json')
+            own_recipes.append(response.data['id'])
+            return response
+
+        def update(client):
+            return client.patch(f'/api/recipes/{rng.choice(own_recipes)}/',
+                                recipe_payload(), format='json')
+
+        return {
+            'recipe_list': lambda client: client.get('/api/recipes/'),
+            'recipe_list_anonymous': lambda client: APIClient().get(
+                '/api/recipes/', {'page': rng.randint(1, 50)}
+            ),
+            'recipe_list_tags': lambda client: client.get(
+                '/api/recipes/',
+                {'tags': [f'tag{i}' for i in rng.sample(range(len(tags)),
+                                                        min(2, len(tags)))]}
+            ),
+            'recipe_list_author': lambda client: client.get(
+                '/api/recipes/', {'author': rng.choice(data['users'])}
+            ),
+            'recipe_list_favorited': lambda client: client.get(
+                '/api/recipes/', {'is_favorited': 1}
+            ),
+            'recipe_list_cursor': lambda client: client.get(
+                '/api/recipes/', {'cursor': ''}
+            ),
+            'recipe_detail': lambda client: client.get(
+                f'/api/recipes/{rng.choice(data["recipes"])}/'
+            ),
+            'subscriptions': lambda client: client.get(
+                '/api/users/subscriptions/', {'recipes_limit': 3}
+            ),
+            'ingredient_search': lambda client: client.get(
+                '/api/ingredients/', {'name': f'продукт {rng.randint(1, 99)}'}
+            ),
+            'shopping_cart_download': lambda client: client.get(
+                '/api/recipes/download_shopping_cart/'
+            ),
+            'recipe_create': create,
+            'recipe_update': update,
+        }
+
+    def measure(self, scenario, client, repeat):
+        """
+        Время и число запросов к базе, затем память на отдельном проходе,
+        чтобы tracemalloc не искажал время.
+        """
+        timings, queries, statuses = [], [], set()
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = scenario(client)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+        peaks, retained = [], []
+        tracemalloc.start()
+        try:
+            for _ in range(max(repeat // 10, 1)):
+                tracemalloc.clear_traces()
+                response = scenario(client)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak / 1024)
+                retained.append(current / 1024)
+        finally:
+            tracemalloc.stop()
+        return {
+            'requests': repeat,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'queries_p50': percentile(queries, 0.5),
+            'queries_max': max(queries),
+            'alloc_peak_kb': round(percentile(peaks, 0.5), 1),
+            'alloc_retained_kb': round(percentile(retained, 0.5), 1),
+        }
+
+    def run_scenarios(self, dataset, rng, repeat):
+        self.stderr.write('Заполнение временной базы...')
+        data = seed_dataset(**dataset, log=self.stderr.write)
+        cache.clear()
+        user_id = Subscribe.objects.values_list(
+            'user_id', flat=True
+        ).first() or data['users'][0]
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION='Token ' + Token.objects.create(
+                user_id=user_id
+            ).key
+        )
+        results = {}
+        for name, scenario in self.get_scenarios(data, rng).items():
+            self.stderr.write(name)
+            scenario(client)
+            results[name] = self.measure(scenario, client, repeat)
+        return results
+
+    def handle(self, *args, **options):
+        dataset = {
+            name: options[name] for name in (
+                'users', 'recipes', 'ingredients', 'tags',
+                'ingredients_per_recipe', 'favorites_per_user',
+                'carts_per_user', 'subscriptions_per_user', 'seed',
+            )
+        }
+        rng = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(ALLOWED_HOSTS=['testserver'],
+                                       MEDIA_ROOT=media_root):
+                    results = self.run_scenarios(dataset, rng,
+                                                 options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        report = json.dumps({
+            'dataset': dataset,
+            'endpoints': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        self.stdout.write(report)
@@ -0,0 +1,95 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import FlatRecipeSerializer, RecipeSerializer
+from api.views import RecipeViewSet
+from recipes.management.seed import seed_dataset
+from users.models import User
+
+
+def get_view(user, action):
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = user
+    return RecipeViewSet(request=request, format_kwarg=None, action=action)
+
+
+def render_pages(serialize, view, page_size):
+    """
+    Все страницы рецептов, отрисованные одним из сериализаторов,
+    и суммарное время сериализации.
+    """
+    queryset = view.get_queryset()
+    ids = list(queryset.values_list('id', flat=True))
+    context = view.get_serializer_context()
+    pages, elapsed = [], 0.0
+    for start in range(0, len(ids), page_size):
+        page = queryset.filter(id__in=ids[start:start + page_size])
+        begin = time.perf_counter()
+        data = serialize(page, context)
+        elapsed += time.perf_counter() - begin
+        pages.append(JSONRenderer().render(data))
+    return pages, elapsed
+
+
+def serialize_models(queryset, context):
+    return RecipeSerializer(queryset, many=True, context=context).data
+
+
+def serialize_flat(queryset, context):
+    return FlatRecipeSerializer(
+        FlatRecipeSerializer.get_rows(queryset), context=context
+    ).data
+
+
+class Command(BaseCommand):
+    help = ('Проверка, что FlatRecipeSerializer отдаёт побайтно тот же JSON, '
+            'что RecipeSerializer, и сравнение их скорости')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', default=2000, type=int)
+        parser.add_argument('--page-size', default=50, type=int)
+        parser.add_argument('--users', default=5, type=int,
+                            help='Число проверяемых пользователей.')
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def compare(self, user, action, page_size):
+        expected, model_time = render_pages(
+            serialize_models, get_view(user, action), page_size
+        )
+        actual, flat_time = render_pages(
+            serialize_flat, get_view(user, action), page_size
+        )
+        for number, (left, right) in enumerate(zip(expected, actual), 1):
+            if left != right:
+                raise CommandError(
+                    f'{user} {action}: страница {number} отличается\n'
+                    f'{left[:500]}\n{right[:500]}'
+                )
+        self.stdout.write(
+            f'{user} {action}: {len(expected)} стр. совпадают, '
+            f'RecipeSerializer {model_time * 1000:.1f} мс, '
+            f'FlatRecipeSerializer {flat_time * 1000:.1f} мс, '
+            f'быстрее в {model_time / flat_time:.1f} раз'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_dataset(users=100, recipes=options['recipes'],
+                         favorites_per_user=50, carts_per_user=10,
+                         subscriptions_per_user=20)
+            users = [AnonymousUser()]
+            users += list(User.objects.order_by('id')[:options['users']])
+            for user in users:
+                for action in ('list', 'retrieve'):
+                    self.compare(user, action, options['page_size'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
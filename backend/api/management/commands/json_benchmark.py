@@ -0,0 +1,95 @@
+import base64
+import json
+import os
+import timeit
+from io import BytesIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import ORJSONParser, ORJSONRenderer
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from recipes.management.seed import seed_dataset
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+def get_recipe_page(page_size):
+    """
+    Данные страницы рецептов в том виде, в каком их отдаёт API.
+    """
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = AnonymousUser()
+    view = RecipeViewSet(request=request, format_kwarg=None, action='list')
+    return RecipeSerializer(
+        view.get_queryset()[:page_size],
+        many=True,
+        context={'request': request, 'view': view}
+    ).data
+
+
+class Command(BaseCommand):
+    help = ('Сравнение скорости стандартных JSON рендерера и парсера '
+            'с реализацией на orjson')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', default='6,50,200')
+        parser.add_argument('--image-megabytes', default=3, type=int)
+        parser.add_argument('--repeat', default=200, type=int)
+
+    def compare(self, name, standard, fast, repeat):
+        standard_time = timeit.timeit(standard, number=repeat) / repeat
+        fast_time = timeit.timeit(fast, number=repeat) / repeat
+        self.stdout.write(
+            f'{name}: json {standard_time * 1000:.3f} мс, '
+            f'orjson {fast_time * 1000:.3f} мс, '
+            f'быстрее в {standard_time / fast_time:.1f} раз'
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_dataset(users=50, recipes=500, favorites_per_user=5,
+                         carts_per_user=5, subscriptions_per_user=5)
+            pages = {
+                int(size): get_recipe_page(int(size))
+                for size in options['page_sizes'].split(',')
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        standard, fast = JSONRenderer(), ORJSONRenderer()
+        for size, data in pages.items():
+            same = standard.render(data) == fast.render(data)
+            self.compare(
+                f'Рендер {size} рецептов (совпадает: {same})',
+                lambda: standard.render(data),
+                lambda: fast.render(data),
+                repeat,
+            )
+
+        image = base64.b64encode(
+            os.urandom(options['image_megabytes'] * 1024 * 1024)
+        ).decode()
+        body = json.dumps({
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [1, 2],
+            'ingredients': [{'id': i, 'amount': 10} for i in range(25)],
+            'image': f'data:image/png;base64,{image}',
+        }).encode()
+        self.compare(
+            f'Разбор рецепта с картинкой {len(body) // 1024} КБ',
+            lambda: JSONParser().parse(BytesIO(body)),
+            lambda: ORJSONParser().parse(BytesIO(body)),
+            max(repeat // 10, 1),
+        )
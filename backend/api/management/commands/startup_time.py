@@ -0,0 +1,35 @@
+import json
+import subprocess
+import sys
+from statistics import median
+
+from django.core.management.base import BaseCommand
+
+from foodgram.settings import BASE_DIR
+
+CHILD = 'from foodgram.warmup import measure_startup; measure_startup({})'
+
+
+class Command(BaseCommand):
+    help = ('Замер холодного старта приложения и первых запросов '
+            'в отдельных процессах без прогрева и с прогревом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', default=5, type=int)
+
+    def run_child(self, warm_up):
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD.format(warm_up)],
+            cwd=BASE_DIR, check=True, stdout=subprocess.PIPE,
+        ).stdout
+        return json.loads(output.decode().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        report = {}
+        for mode, warm_up in (('cold', False), ('warm_up', True)):
+            runs = [self.run_child(warm_up) for _ in range(options['repeat'])]
+            report[mode] = {
+                key: round(median(run[key] for run in runs), 1)
+                for key in runs[0]
+            }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
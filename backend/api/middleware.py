@@ -0,0 +1,174 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.settings import SLOW_REQUEST_QUERIES, SLOW_REQUEST_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Запросы к базе и время обработки одного HTTP-запроса.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @contextmanager
+    def collect(self):
+        """
+        Учёт запросов ко всем базам и времени сериализации.
+        """
+        token = current_metrics.set(self)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self))
+                yield
+        finally:
+            current_metrics.reset(token)
+            self.total = time.perf_counter() - self.start
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def get_duplicates(self):
+        """
+        Запросы, повторённые с разными параметрами, обычно это N+1.
+        """
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+    def get_server_timing(self):
+        duplicates = sum(self.get_duplicates().values())
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{len(self.queries)} queries, {duplicates} duplicated"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ))
+
+    def get_slow_queries(self):
+        """
+        Самые долгие запросы с числом повторов, без значений параметров.
+        """
+        times = Counter()
+        counts = Counter()
+        for sql, duration in self.queries:
+            times[sql] += duration
+            counts[sql] += 1
+        return [
+            {'sql': sql, 'count': counts[sql], 'ms': round(duration * 1000, 1)}
+            for sql, duration in times.most_common(SLOW_REQUEST_QUERIES)
+        ]
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Учёт времени сериализации в метриках текущего запроса,
+    вложенные замеры отдельно не считаются.
+    """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializer_depth:
+        yield
+        return
+    metrics.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+        metrics.serializer_depth -= 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Число и время SQL-запросов, повторяющиеся запросы, время сериализации
+    и общее время запроса в заголовке Server-Timing и в журнале.
+    Медленные запросы и чтения сверх query_budget представления
+    журналируются вместе с SQL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        with metrics.collect():
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, metrics, response.streaming_content
+            )
+            return response
+        response['Server-Timing'] = metrics.get_server_timing()
+        self.log(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        request.metrics_view = getattr(view_func, '__qualname__', None)
+        if view_class is not None:
+            request.metrics_view = view_class.__name__
+        request.query_budget = getattr(view_class, 'query_budget', None)
+
+    def stream(self, request, response, metrics, content):
+        """
+        Запросы потоковых ответов выполняются при отдаче тела,
+        поэтому они попадают только в журнал.
+        """
+        with metrics.collect():
+            yield from content
+        self.log(request, response, metrics)
+
+    def log(self, request, response, metrics):
+        duplicates = metrics.get_duplicates()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request, 'metrics_view', None),
+            'status': response.status_code,
+            'queries': len(metrics.queries),
+            'duplicated_queries': sum(duplicates.values()),
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'serializer_ms': round(metrics.serializer_time * 1000, 1),
+            'total_ms': round(metrics.total * 1000, 1),
+        }
+        logger.info(json.dumps(record, ensure_ascii=False))
+        budget = getattr(request, 'query_budget', None)
+        over_budget = (
+            budget is not None and request.method in SAFE_METHODS
+            and len(metrics.queries) > budget
+        )
+        if metrics.total * 1000 >= SLOW_REQUEST_THRESHOLD or over_budget:
+            record.update(
+                query_budget=budget,
+                slow_queries=metrics.get_slow_queries(),
+                duplicates=[
+                    {'sql': sql, 'count': count}
+                    for sql, count in duplicates.items()
+                ],
+            )
+            logger.warning(json.dumps(record, ensure_ascii=False))
@@ -1,6 +1,85 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.http import HttpResponseNotModified
+from django.utils.cache import parse_etags, patch_vary_headers
+
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from foodgram.settings import REFERENCE_CACHE_TIMEOUT
+from .cache import get_etag, get_request_cache_key
+from .middleware import timed_serialization
+
 
 class ListRetriveViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
     pass
+
+
+class VersionedCacheMixin:
+    """
+    Кеширование ответов с проверкой ETag.
+    Версия кеша `cache_name` меняется сигналами при изменении данных.
+    ETag считается по телу успешного ответа на GET, ответы
+    анонимным и авторизованным пользователям различаются по Vary.
+    Время сериализации при промахе кеша попадает в метрики запроса.
+    """
+    cache_name = None
+    cache_timeout = REFERENCE_CACHE_TIMEOUT
+    cache_anonymous_only = False
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(self.list_uncached, request,
+                                        *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(self.retrieve_uncached, request,
+                                        *args, **kwargs)
+
+    def get_serializer_data(self, serializer):
+        with timed_serialization():
+            return serializer.data
+
+    def list_uncached(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(
+                self.get_serializer_data(serializer)
+            )
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(self.get_serializer_data(serializer))
+
+    def retrieve_uncached(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        return Response(self.get_serializer_data(serializer))
+
+    def get_cached_response(self, action, request, *args, **kwargs):
+        if self.cache_anonymous_only and request.user.is_authenticated:
+            return action(request, *args, **kwargs)
+        key = get_request_cache_key(self.cache_name, request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = action(request, *args, **kwargs)
+        if response.status_code == HTTPStatus.OK:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response,
+                                             *args, **kwargs)
+        patch_vary_headers(response, ('Authorization',))
+        if (request.method not in ('GET', 'HEAD')
+                or response.status_code != HTTPStatus.OK):
+            return response
+        response.render()
+        etag = get_etag(response.content)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            not_modified = HttpResponseNotModified()
+            not_modified['Vary'] = response['Vary']
+            response = not_modified
+        response['ETag'] = etag
+        return response
@@ -1,13 +1,262 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
-from foodgram.settings import PAGES
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.settings import (COUNT_CACHE_TIMEOUT, COUNT_ESTIMATE_THRESHOLD,
+                               PAGES)
+
+
+def get_estimated_count(queryset):
+    """
+    Оценка числа строк по статистике планировщика Postgres.
+    Только для запросов без условий к большим таблицам.
+    """
+    connection = connections[queryset.db]
+    query = queryset.query
+    if (connection.vendor != 'postgresql' or query.where or query.distinct
+            or query.combinator or query.low_mark or query.high_mark):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < COUNT_ESTIMATE_THRESHOLD:
+        return None
+    return int(row[0])
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Точное число объектов кешируется по тексту запроса,
+    для больших таблиц без фильтров берётся оценка планировщика.
+    """
+    count_is_approximate = False
+
+    def get_count_queryset(self, queryset):
+        """
+        Запрос без сортировки и аннотаций в SELECT: флаги избранного
+        и корзины зависят от пользователя, но не меняют число строк.
+        Аннотации из условий фильтрации остаются в WHERE.
+        """
+        if queryset.query.group_by is not None or queryset.query.distinct:
+            return queryset.order_by()
+        return queryset.values('pk').order_by()
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return len(queryset)
+        estimate = get_estimated_count(queryset)
+        if estimate is not None:
+            self.count_is_approximate = True
+            return estimate
+        queryset = self.get_count_queryset(queryset)
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'count:' + md5(f'{sql}{params}'.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def page(self, number):
+        """
+        Срез страницы не обрезается по count,
+        который может быть устаревшим или приблизительным.
+        """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+
+class KeysetPagination:
+    """
+    Постраничный вывод по ключу сортировки без COUNT и OFFSET.
+    Ключ берётся из сортировки queryset, id добавляется для однозначности.
+    """
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, cursor_query_param, page_size):
+        self.cursor_query_param = cursor_query_param
+        self.page_size = page_size
+
+    def get_ordering(self, queryset):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if not all(
+            isinstance(field, str) and LOOKUP_SEP not in field
+            for field in ordering
+        ):
+            raise NotFound('Сортировка не поддерживает курсор.')
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append('-id' if descending else 'id')
+        return ordering
+
+    def encode_cursor(self, row, reverse):
+        if not isinstance(row, dict):
+            row = row.__dict__
+        values = [row[field.lstrip('-')] for field in self.ordering]
+        data = json.dumps({'v': values, 'r': reverse},
+                          default=lambda value: value.isoformat())
+        return urlsafe_b64encode(data.encode()).decode()
+
+    def get_fields(self, queryset):
+        """
+        Поля модели или аннотаций для проверки значений курсора.
+        """
+        fields = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if name in queryset.query.annotations:
+                fields.append(queryset.query.annotations[name].output_field)
+            else:
+                fields.append(queryset.model._meta.get_field(
+                    'id' if name == 'pk' else name
+                ))
+        return fields
+
+    def decode_cursor(self, cursor, fields):
+        """
+        Значения курсора приводятся к типам полей сортировки,
+        любой испорченный курсор даёт 404.
+        """
+        try:
+            data = json.loads(urlsafe_b64decode(cursor.encode()))
+            values, reverse = data['v'], bool(data['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+        if not all(
+            isinstance(value, (str, int, float))
+            and not isinstance(value, bool)
+            for value in values
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [
+                field.to_python(value) for field, value in zip(fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_keyset_filter(self, values, reverse):
+        """
+        Строки после ключа: (a, b) > (x, y) это a > x или a = x и b > y.
+        """
+        keyset_filter = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            keyset_filter |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return keyset_filter
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        cursor = request.query_params.get(self.cursor_query_param)
+        values, reverse = (
+            self.decode_cursor(cursor, self.get_fields(queryset))
+            if cursor else (None, False)
+        )
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(values, reverse)
+            )
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        self.next = self.previous = None
+        if rows:
+            if has_more or reverse:
+                self.next = self.encode_cursor(rows[-1], False)
+            if (has_more and reverse) or (values is not None and not reverse):
+                self.previous = self.encode_cursor(rows[0], True)
+        return rows
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_link(self.next)),
+            ('previous', self.get_link(self.previous)),
+            ('results', data),
+        ]))
 
 
 class CustomPagination(PageNumberPagination):
     """
     Пагинатор проекта.
+    С параметром cursor, в том числе пустым, переходит
+    на постраничный вывод по ключу сортировки.
     """
     page_size = PAGES
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    django_paginator_class = CachedCountPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.display_page_controls = False
+        self.keyset = KeysetPagination(self.cursor_query_param, page_size)
+        return self.keyset.paginate_queryset(queryset, request)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_approximate', self.page.paginator.count_is_approximate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
 
 
 class RecipesLimitPagination(PageNumberPagination):
@@ -1,9 +1,13 @@
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
 from rest_framework import serializers
 
+from recipes.images import get_variant_url
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart, Tag, TagRecipe)
+from recipes.shopping_list import change_recipe_ingredients, get_recipe_amounts
 from users.models import Subscribe, User
+from .utils import get_subscribed_author_ids
 
 
 class Base64ImageField(serializers.ImageField):
@@ -44,6 +48,35 @@ class Base64ImageField(serializers.ImageField):
         return extension
 
 
+class ThumbnailImageField(serializers.ImageField):
+    """
+    Ссылка на вариант картинки нужного размера.
+    Для страницы одного объекта можно задать отдельный размер.
+    """
+
+    def __init__(self, size, detail_size=None, **kwargs):
+        self.size = size
+        self.detail_size = detail_size or size
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_size(self):
+        view = self.context.get('view')
+        if getattr(view, 'action', None) == 'retrieve':
+            return self.detail_size
+        return self.size
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = get_variant_url(value, self.get_size(),
+                              value.instance.thumbnails_ready)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели пользователя.
@@ -66,15 +99,9 @@ class UserSerializer(serializers.ModelSerializer):
         Функция обработки параметра подписчиков.
         """
         request = self.context.get('request')
-        if request.user.is_anonymous:
+        if request is None or request.user.is_anonymous:
             return False
-        return(
-            Subscribe.objects.filter(
-                user=request.user,
-                author__id=obj.id
-            ).exists()
-            and request.user.is_authenticated
-        )
+        return obj.id in get_subscribed_author_ids(request)
 
 
 class ShoppingCartFavoriteRecipes(metaclass=serializers.SerializerMetaclass):
@@ -89,41 +116,43 @@ class ShoppingCartFavoriteRecipes(metaclass=serializers.SerializerMetaclass):
         """
         Функция обработки параметра избранного.
         """
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
-        return (
-            Favorite.objects.filter(user=request.user,
-                                    recipe__id=obj.id).exists()
-            and request.user.is_authenticated
-        )
+        return Favorite.objects.filter(user=request.user,
+                                       recipe__id=obj.id).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
-        return (
-            ShoppingCart.objects.filter(user=request.user,
-                                        recipe__id=obj.id).exists()
-            and request.user.is_authenticated
-        )
+        return ShoppingCart.objects.filter(user=request.user,
+                                           recipe__id=obj.id).exists()
 
     def validate_ingredients(self, value):
-        ingredients_list = []
-        ingredients = value
-        for ingredient in ingredients:
-            if ingredient['amount'] < 1:
-                raise serializers.ValidationError(
-                    'Количество должно быть равным или больше 1!')
-            check_id = ingredient['ingredient']['id']
-            check_ingredient = Ingredient.objects.filter(id=check_id)
-            if not check_ingredient.exists():
-                raise serializers.ValidationError(
-                    'Ингредиента нет в базе!')
-            if check_ingredient in ingredients_list:
-                raise serializers.ValidationError(
-                    'Продукты не должны повторяться!')
-            ingredients_list.append(check_ingredient)
+        ingredient_ids = [
+            ingredient['ingredient']['id'] for ingredient in value
+        ]
+        if any(ingredient['amount'] < 1 for ingredient in value):
+            raise serializers.ValidationError(
+                'Количество должно быть равным или больше 1!')
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Продукты не должны повторяться!')
+        if Ingredient.objects.filter(
+                id__in=ingredient_ids).count() != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Ингредиента нет в базе!')
+        return value
+
+    def validate_tags(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError(
+                'Теги не должны повторяться!')
         return value
 
 
@@ -136,7 +165,7 @@ class RecipesCount(metaclass=serializers.SerializerMetaclass):
         """
         Функция подсчёта количества рецептов автора.
         """
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.recipes_count
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -182,6 +211,9 @@ class IngredientInRecipeShortSerializer(serializers.ModelSerializer):
         model = IngredientInRecipe
         fields = ('id', 'amount')
 
+    def to_representation(self, instance):
+        return {'id': instance.ingredient_id, 'amount': instance.amount}
+
 
 class RecipeSerializer(serializers.ModelSerializer,
                        ShoppingCartFavoriteRecipes):
@@ -194,6 +226,7 @@ class RecipeSerializer(serializers.ModelSerializer,
                                                source='recipe_ingredient')
     is_in_shopping_cart = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
+    image = ThumbnailImageField(size='card', detail_size='webp')
 
     class Meta:
         model = Recipe
@@ -202,10 +235,124 @@ class RecipeSerializer(serializers.ModelSerializer,
                   'is_favorited', 'is_in_shopping_cart')
 
 
+class FlatRecipeSerializer:
+    """
+    Сериализатор рецептов для чтения без моделей и полей DRF.
+    Строит тот же JSON, что RecipeSerializer, из строк values():
+    теги и продукты всей страницы загружаются двумя запросами.
+    """
+    recipe_fields = ('id', 'name', 'text', 'cooking_time', 'pub_date',
+                     'image', 'thumbnails_ready', 'author_id', 'author__email',
+                     'author__username', 'author__first_name',
+                     'author__last_name')
+    image_size = 'card'
+    detail_image_size = 'webp'
+    pub_date_field = serializers.DateTimeField()
+    image_storage = Recipe._meta.get_field('image').storage
+
+    def __init__(self, rows, context=None):
+        self.rows = list(rows)
+        self.context = context or {}
+
+    @classmethod
+    def get_rows(cls, queryset):
+        """
+        Строки рецептов с автором и всеми аннотациями:
+        флагами избранного и корзины и ключами сортировки.
+        """
+        return queryset.prefetch_related(None).values(
+            *cls.recipe_fields, *queryset.query.annotations
+        )
+
+    def get_tags(self, recipe_ids):
+        tags = {}
+        recipe_tags = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = TagRecipe.objects.filter(recipe_id__in=recipe_ids).order_by(
+            'tag_id'
+        ).values_list('recipe_id', 'tag_id', 'tag__name', 'tag__color',
+                      'tag__slug')
+        for recipe_id, tag_id, name, color, slug in rows:
+            if tag_id not in tags:
+                tags[tag_id] = {
+                    'id': tag_id, 'name': name, 'color': color, 'slug': slug
+                }
+            recipe_tags[recipe_id].append(tags[tag_id])
+        return recipe_tags
+
+    def get_ingredients(self, recipe_ids):
+        recipe_ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list('recipe_id', 'ingredient_id',
+                                     'ingredient__name',
+                                     'ingredient__measurement_unit', 'amount')
+        for recipe_id, ingredient_id, name, unit, amount in rows:
+            recipe_ingredients[recipe_id].append({
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            })
+        return recipe_ingredients
+
+    def get_image_url(self, name, ready):
+        if not name:
+            return None
+        view = self.context.get('view')
+        size = self.image_size
+        if getattr(view, 'action', None) == 'retrieve':
+            size = self.detail_image_size
+        url = get_variant_url(name, size, ready, self.image_storage)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    @property
+    def data(self):
+        recipe_ids = [row['id'] for row in self.rows]
+        if not recipe_ids:
+            return []
+        tags = self.get_tags(recipe_ids)
+        ingredients = self.get_ingredients(recipe_ids)
+        request = self.context.get('request')
+        subscribed = set()
+        if request is not None and not request.user.is_anonymous:
+            subscribed = get_subscribed_author_ids(request)
+        return [
+            {
+                'id': row['id'],
+                'author': {
+                    'id': row['author_id'],
+                    'email': row['author__email'],
+                    'username': row['author__username'],
+                    'first_name': row['author__first_name'],
+                    'last_name': row['author__last_name'],
+                    'is_subscribed': row['author_id'] in subscribed,
+                },
+                'name': row['name'],
+                'ingredients': ingredients[row['id']],
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+                'pub_date': self.pub_date_field.to_representation(
+                    row['pub_date']
+                ),
+                'image': self.get_image_url(row['image'],
+                                            row['thumbnails_ready']),
+                'tags': tags[row['id']],
+                'is_favorited': row.get('is_favorited', False),
+                'is_in_shopping_cart': row.get('is_in_shopping_cart', False),
+            }
+            for row in self.rows
+        ]
+
+
 class RecipeShortFieldSerializer(serializers.ModelSerializer):
     """
     Сериализатор короткой версии отображения модели рецептов.
     """
+    image = ThumbnailImageField(size='small')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'cooking_time', 'image')
@@ -235,57 +382,47 @@ class RecipeSerializerPost(serializers.ModelSerializer,
         """
         Функция добавления тегов и продуктов в рецепт.
         """
-        for tag in tags:
-            recipe.tags.add(tag)
-            recipe.save()
-        for ingredient in ingredients:
-            if not IngredientInRecipe.objects.filter(
-                    ingredient_id=ingredient['ingredient']['id'],
-                    recipe=recipe).exists():
-                ingredientinrecipe = IngredientInRecipe.objects.create(
-                    ingredient_id=ingredient['ingredient']['id'],
-                    recipe=recipe)
-                ingredientinrecipe.amount = ingredient['amount']
-                ingredientinrecipe.save()
-            else:
-                IngredientInRecipe.objects.filter(recipe=recipe).delete()
-                recipe.delete()
-                raise serializers.ValidationError(
-                    'Продукты не могут повторяться в рецепте!')
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag) for tag in tags
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient['ingredient']['id'],
+                amount=ingredient['amount'],
+            ) for ingredient in ingredients
+        )
         return recipe
 
+    @transaction.atomic
     def create(self, validated_data):
         """
         Функция создания рецепта.
         """
-        author = validated_data.get('author')
         tags = validated_data.pop('tags')
-        name = validated_data.get('name')
-        image = validated_data.get('image')
-        text = validated_data.get('text')
-        cooking_time = validated_data.get('cooking_time')
         ingredients = validated_data.pop('recipe_ingredient')
-        recipe = Recipe.objects.create(author=author, name=name,
-                                       image=image, text=text,
-                                       cooking_time=cooking_time,)
-        recipe = self.add_ingredients_and_tags(tags, ingredients, recipe)
-        return recipe
+        recipe = Recipe.objects.create(**validated_data)
+        return self.add_ingredients_and_tags(tags, ingredients, recipe)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
         Функция редактирования рецепта.
         """
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipe_ingredient')
+        old_amounts = get_recipe_amounts(instance.pk)
         TagRecipe.objects.filter(recipe=instance).delete()
         IngredientInRecipe.objects.filter(recipe=instance).delete()
-        instance = self.add_ingredients_and_tags(tags, ingredients, instance)
-        super().update(instance, validated_data)
-        instance.save()
-        return instance
+        self.add_ingredients_and_tags(tags, ingredients, instance)
+        change_recipe_ingredients(instance.pk, old_amounts, {
+            ingredient['ingredient']['id']: ingredient['amount']
+            for ingredient in ingredients
+        })
+        return super().update(instance, validated_data)
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
+class SubscribeSerializer(serializers.ModelSerializer, RecipesCount):
     """
     Сериализатор списка подписок.
     """
@@ -296,10 +433,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
     first_name = serializers.ReadOnlyField(source='author.first_name')
     last_name = serializers.ReadOnlyField(source='author.last_name')
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipe_author.count',
-        read_only=True
-    )
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Subscribe
@@ -313,26 +447,16 @@ class SubscribeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request:
             return True
-        return(
-            Subscribe.objects.filter(
-                user=request.user,
-                author__id=obj.id
-            ).exists()
-            and request.user.is_authenticated
-        )
+        return obj.author_id in get_subscribed_author_ids(request)
 
     def get_recipes(self, obj):
         """
         Функция получения рецептов
         автора.
         """
-        try:
-            recipes_limit = int(
-                self.context.get('request').query_params['recipes_limit']
-            )
-            recipes = Recipe.objects.filter(author=obj.author)[:recipes_limit]
-        except Exception:
-            recipes = Recipe.objects.filter(author=obj.author)
+        recipes = getattr(obj.author, 'limited_recipes', None)
+        if recipes is None:
+            recipes = obj.author.recipe_author.all()
         serializer = RecipeShortFieldSerializer(recipes, many=True,)
         return serializer.data
 
@@ -347,6 +471,8 @@ class ShoppingCartSerializer(serializers.Serializer):
 
 
 class RecipeCartSerializer(serializers.ModelSerializer):
+    image = ThumbnailImageField(size='small')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe, Tag,
+                            TagRecipe)
+from users.models import User
+from .authentication import forget_tokens
+from .cache import bump_cache_version
+
+# Поля автора, которые попадают в ответы с рецептами.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def invalidate(*names):
+    """
+    Версии меняются после фиксации транзакции, чтобы параллельный запрос
+    не закешировал старые данные под новой версией.
+    """
+    def bump():
+        for name in names:
+            bump_cache_version(name)
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    invalidate('ingredients', 'recipes')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(**kwargs):
+    invalidate('tags', 'recipes')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_delete, sender=TagRecipe)
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+@receiver(post_delete, sender=User)
+def invalidate_recipes(**kwargs):
+    invalidate('recipes')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(created, update_fields, **kwargs):
+    """
+    У нового пользователя нет рецептов, а сохранение только
+    last_login при входе не меняет данные автора в рецептах.
+    """
+    if created or (
+        update_fields is not None and not AUTHOR_FIELDS & set(update_fields)
+    ):
+        return
+    invalidate('recipes')
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(instance, **kwargs):
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_tokens(instance, **kwargs):
+    """
+    Смена пароля и другие изменения пользователя
+    сбрасывают закешированную аутентификацию.
+    """
+    forget_tokens(
+        Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    )
@@ -0,0 +1,550 @@
+import json
+import shutil
+import tempfile
+from base64 import b64encode, urlsafe_b64encode
+from io import BytesIO
+from itertools import count
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.test import TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag, TagRecipe)
+from recipes.search import search_recipes
+from recipes.shopping_list import recount_shopping_lists
+from users.models import Subscribe, User
+from .authentication import get_token_cache_key
+from .cache import get_cache_version
+from .pagination import CachedCountPaginator
+from .views import RecipeViewSet
+
+RECIPES = 12
+PAGE_SIZES = (2, 10)
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def get_image():
+    buffer = BytesIO()
+    Image.new('RGB', (10, 10), (200, 120, 40)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + b64encode(buffer.getvalue()).decode()
+
+
+class RecipeTestCase(TestCase):
+    """
+    Пользователи, теги, продукты и рецепты с избранным и корзиной.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@foodgram.ru', 'user', 'password', first_name='Имя',
+            last_name='Фамилия'
+        )
+        cls.author = User.objects.create_user(
+            'author@foodgram.ru', 'author', 'password', first_name='Имя',
+            last_name='Фамилия'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        Subscribe.objects.create(user=cls.user, author=cls.author)
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = ingredients = [
+            Ingredient.objects.create(name=f'Продукт {i}',
+                                      measurement_unit='г')
+            for i in range(10)
+        ]
+        cls.recipes = []
+        for i in range(RECIPES):
+            recipe = Recipe.objects.create(
+                author=(cls.author, cls.user)[i % 2], name=f'Рецепт {i}',
+                image='recipes/images/recipe.png', text='Описание',
+                cooking_time=10
+            )
+            TagRecipe.objects.bulk_create(
+                TagRecipe(recipe=recipe, tag=tag) for tag in cls.tags[:i % 3 + 1]
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                                   amount=i + 1)
+                for ingredient in ingredients[:i % 5 + 1]
+            )
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if i % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous_client = APIClient()
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.token.key
+        )
+
+
+class RecipeQueryBudgetTest(RecipeTestCase):
+    """
+    Число запросов к базе для рецептов не превышает query_budget
+    и не зависит от размера страницы.
+    """
+
+    def count_queries(self, client, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_list_queries(self, client, data=None):
+        counts = [
+            self.count_queries(client, '/api/recipes/',
+                               {**(data or {}), 'limit': page_size})
+            for page_size in PAGE_SIZES
+        ]
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[0], RecipeViewSet.query_budget)
+
+    def test_list_anonymous(self):
+        self.assert_list_queries(self.anonymous_client)
+
+    def test_list_authorized(self):
+        self.assert_list_queries(self.authorized_client)
+
+    def test_list_filtered_by_tags(self):
+        for client in (self.anonymous_client, self.authorized_client):
+            with self.subTest(client=client):
+                self.assert_list_queries(
+                    client, {'tags': ['tag0', 'tag1']}
+                )
+
+    def test_detail(self):
+        for client in (self.anonymous_client, self.authorized_client):
+            with self.subTest(client=client):
+                counts = [
+                    self.count_queries(client, f'/api/recipes/{recipe.id}/')
+                    for recipe in (self.recipes[0], self.recipes[-1])
+                ]
+                self.assertEqual(counts[0], counts[1])
+                self.assertLessEqual(counts[0], RecipeViewSet.query_budget)
+
+
+class RecipeCursorTest(RecipeTestCase):
+    """
+    Испорченный курсор даёт 404, а не ошибку сервера.
+    """
+
+    def get_cursor(self, data):
+        return urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-base64', self.get_cursor([]),
+                       self.get_cursor({'v': 5, 'r': 0}),
+                       self.get_cursor({'v': ['abc', 1], 'r': 0}),
+                       self.get_cursor({'v': [None, 1], 'r': 0}),
+                       self.get_cursor({'v': [[1], 1], 'r': 0})):
+            with self.subTest(cursor=cursor):
+                response = self.anonymous_client.get(
+                    '/api/recipes/', {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_next_page(self):
+        response = self.anonymous_client.get(
+            '/api/recipes/', {'cursor': '', 'limit': 5}
+        )
+        next_response = self.anonymous_client.get(response.data['next'])
+        self.assertEqual(next_response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in next_response.data['results']],
+            [recipe.id for recipe in reversed(self.recipes)][5:10]
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ShoppingListTest(RecipeTestCase):
+    """
+    Список покупок после изменений корзины и рецептов
+    совпадает с пересчитанным заново.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get_shopping_lists(self):
+        return sorted(ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ))
+
+    def assert_shopping_lists_recounted(self):
+        shopping_lists = self.get_shopping_lists()
+        recount_shopping_lists(apps)
+        self.assertEqual(shopping_lists, self.get_shopping_lists())
+
+    def test_initial(self):
+        self.assertTrue(self.get_shopping_lists())
+        self.assert_shopping_lists_recounted()
+
+    def test_add_and_remove(self):
+        recipe = self.recipes[3]
+        response = self.authorized_client.post(
+            f'/api/recipes/{recipe.id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assert_shopping_lists_recounted()
+        response = self.authorized_client.delete(
+            f'/api/recipes/{self.recipes[1].id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_shopping_lists_recounted()
+
+    def test_remove_all(self):
+        for recipe in self.recipes:
+            ShoppingCart.objects.filter(recipe=recipe).delete()
+        self.assertEqual(self.get_shopping_lists(), [])
+
+    def test_update_recipe_ingredients(self):
+        recipe = self.recipes[1]
+        ShoppingCart.objects.create(user=self.author, recipe=recipe)
+        response = self.authorized_client.patch(
+            f'/api/recipes/{recipe.id}/',
+            {
+                'name': recipe.name, 'text': recipe.text,
+                'cooking_time': recipe.cooking_time, 'image': get_image(),
+                'tags': [self.tags[0].id],
+                'ingredients': [
+                    {'id': self.ingredients[0].id, 'amount': 50},
+                    {'id': self.ingredients[9].id, 'amount': 3},
+                ],
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_shopping_lists_recounted()
+
+    def test_delete_recipe(self):
+        recipe = self.recipes[1]
+        ShoppingCart.objects.create(user=self.author, recipe=recipe)
+        Favorite.objects.filter(recipe=recipe).delete()
+        response = self.authorized_client.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_shopping_lists_recounted()
+
+    def test_download(self):
+        response = self.authorized_client.get(
+            '/api/recipes/download_shopping_cart/'
+        )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), ShoppingListItem.objects.filter(
+            user=self.user
+        ).count())
+
+
+class TokenCacheTest(RecipeTestCase):
+    """
+    Удалённый токен, изменённый или удалённый пользователь
+    перестают аутентифицироваться сразу, а не через TOKEN_CACHE_TIMEOUT.
+    """
+
+    def get_me(self):
+        return self.authorized_client.get('/api/users/me/')
+
+    def setUp(self):
+        super().setUp()
+        self.assertEqual(self.get_me().status_code, 200)
+        self.assertIsNotNone(cache.get(get_token_cache_key(self.token.key)))
+
+    def test_logout(self):
+        response = self.authorized_client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_token_deleted(self):
+        Token.objects.filter(user=self.user).delete()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_user_deactivated(self):
+        with mock.patch.object(User, 'is_active', False):
+            self.user.save()
+            self.assertEqual(self.get_me().status_code, 401)
+
+    def test_user_changed(self):
+        self.user.first_name = 'Другое'
+        self.user.save()
+        self.assertEqual(self.get_me().data['first_name'], 'Другое')
+
+    def test_user_deleted(self):
+        Favorite.objects.filter(user=self.user).delete()
+        self.user.delete()
+        self.assertEqual(self.get_me().status_code, 401)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch.object(transaction, 'on_commit', lambda func: func())
+class RecipeCacheTest(RecipeTestCase):
+    """
+    Изменения рецептов и их авторов сразу видны в закешированных
+    ответах анонимным пользователям.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get_list(self):
+        response = self.anonymous_client.get('/api/recipes/', {'limit': 20})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def get_detail(self, recipe):
+        return self.anonymous_client.get(f'/api/recipes/{recipe.id}/')
+
+    def get_payload(self):
+        return {
+            'name': 'Новый рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': get_image(), 'tags': [self.tags[0].id],
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+        }
+
+    def test_create(self):
+        self.assertEqual(len(self.get_list()), RECIPES)
+        response = self.authorized_client.post(
+            '/api/recipes/', self.get_payload(), format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_list()[0]['id'], response.data['id'])
+
+    def test_update(self):
+        recipe = self.recipes[1]
+        self.get_list()
+        self.get_detail(recipe)
+        response = self.authorized_client.patch(
+            f'/api/recipes/{recipe.id}/', self.get_payload(), format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_detail(recipe).data['name'], 'Новый рецепт')
+        self.assertIn('Новый рецепт',
+                      [recipe['name'] for recipe in self.get_list()])
+
+    def test_delete(self):
+        recipe = self.recipes[1]
+        self.get_list()
+        self.assertEqual(self.get_detail(recipe).status_code, 200)
+        Favorite.objects.filter(recipe=recipe).delete()
+        response = self.authorized_client.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_detail(recipe).status_code, 404)
+        self.assertNotIn(recipe.id, [recipe['id'] for recipe in self.get_list()])
+
+    def test_author_changed(self):
+        recipe = self.recipes[0]
+        self.get_list()
+        self.get_detail(recipe)
+        self.author.first_name = 'Другое'
+        self.author.save(update_fields=['first_name'])
+        self.assertEqual(
+            self.get_detail(recipe).data['author']['first_name'], 'Другое'
+        )
+        self.assertEqual(self.get_list()[-1]['author']['first_name'], 'Другое')
+
+    def test_unrelated_user_fields(self):
+        version = get_cache_version('recipes')
+        self.author.set_password('new-password')
+        self.author.save(update_fields=['password'])
+        User.objects.create_user('new@foodgram.ru', 'new', 'password')
+        response = self.anonymous_client.post('/api/auth/token/login/', {
+            'email': 'author@foodgram.ru', 'password': 'new-password'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_cache_version('recipes'), version)
+
+
+class RecipeSearchTest(RecipeTestCase):
+    """
+    Поиск по названию выше поиска по описанию,
+    без полнотекстового индекса работает поиск по подстроке.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.in_text = Recipe.objects.create(
+            author=cls.author, name='Суп', text='Почти борщ',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+        cls.in_name = Recipe.objects.create(
+            author=cls.author, name='Борщ', text='Со сметаной',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+
+    def search(self, text):
+        return list(search_recipes(Recipe.objects.all(), text))
+
+    def test_ranking(self):
+        recipes = self.search('борщ')
+        self.assertEqual(recipes, [self.in_name, self.in_text])
+        self.assertGreater(recipes[0].search_rank, recipes[1].search_rank)
+
+    def test_prefix(self):
+        self.assertEqual(self.search('смета'), [self.in_name])
+
+    def test_no_match(self):
+        self.assertEqual(self.search('пирог'), [])
+        self.assertEqual(self.search('" *'), [])
+
+    def test_updated_recipe(self):
+        self.in_text.name = 'Пирог'
+        self.in_text.save()
+        self.assertEqual(self.search('пирог'), [self.in_text])
+        self.assertEqual(self.search('суп'), [])
+
+    def test_filter(self):
+        response = self.anonymous_client.get('/api/recipes/',
+                                             {'search': 'борщ'})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.in_name.id, self.in_text.id]
+        )
+
+    def test_fallback(self):
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            recipes = self.search('орщ')
+        self.assertEqual(set(recipes), {self.in_name, self.in_text})
+
+
+@modify_settings(MIDDLEWARE={
+    'prepend': 'api.middleware.RequestMetricsMiddleware'
+})
+class RequestMetricsTest(RecipeTestCase):
+    """
+    Время сериализации попадает в метрики запроса при промахе кеша.
+    """
+
+    def get_serializer_time(self, url):
+        with self.assertLogs('api.middleware', 'INFO') as logs:
+            self.anonymous_client.get(url)
+        return json.loads(logs.records[0].getMessage())['serializer_ms']
+
+    @mock.patch('api.middleware.time.perf_counter', side_effect=count())
+    def test_serializer_time(self, perf_counter):
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipes[0].id}/',
+                    '/api/tags/'):
+            with self.subTest(url=url):
+                self.assertGreater(self.get_serializer_time(url), 0)
+                self.assertEqual(self.get_serializer_time(url), 0)
+
+
+class ETagTest(RecipeTestCase):
+    """
+    304 отдаётся только для успешного ответа с тем же телом.
+    """
+
+    def get(self, client, url, etag):
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipes[0].id}/',
+                    '/api/tags/', '/api/ingredients/'):
+            with self.subTest(url=url):
+                response = self.anonymous_client.get(url)
+                self.assertIn('Authorization', response['Vary'])
+                response = self.get(self.anonymous_client, url,
+                                    response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertIn('Authorization', response['Vary'])
+
+    def test_etag_depends_on_content(self):
+        etag = self.anonymous_client.get('/api/recipes/')['ETag']
+        response = self.get(self.authorized_client, '/api/recipes/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        Recipe.objects.filter(pk=self.recipes[-1].pk).update(name='Другое')
+        cache.clear()
+        response = self.get(self.anonymous_client, '/api/recipes/', etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_any_etag(self):
+        response = self.get(self.anonymous_client, '/api/recipes/', '*')
+        self.assertEqual(response.status_code, 200)
+        response = self.get(self.anonymous_client, '/api/recipes/0/', '*')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+class IngredientSearchTest(RecipeTestCase):
+    """
+    Поиск по началу названия не мешает получению одного продукта.
+    """
+
+    def test_list(self):
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        response = self.anonymous_client.get('/api/ingredients/',
+                                             {'name': 'продукт 1'})
+        self.assertEqual([ingredient['name'] for ingredient in response.data],
+                         ['Продукт 1'])
+        response = self.anonymous_client.get('/api/ingredients/',
+                                             {'name': 'со'})
+        self.assertEqual([ingredient['name'] for ingredient in response.data],
+                         ['Соль'])
+
+    def test_detail(self):
+        ingredient = self.ingredients[0]
+        response = self.anonymous_client.get(
+            f'/api/ingredients/{ingredient.id}/', {'name': 'соль'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], ingredient.id)
+
+
+class CachedCountPaginatorTest(RecipeTestCase):
+    """
+    Число рецептов кешируется общим для всех пользователей,
+    устаревшее число не обрезает страницы.
+    """
+
+    def get_queryset(self, user):
+        return Recipe.objects.annotate(is_favorited=Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+        )).filter(cooking_time=10)
+
+    def test_cached_count(self):
+        paginator = CachedCountPaginator(self.get_queryset(self.user), 5)
+        self.assertEqual(paginator.count, RECIPES)
+        with self.assertNumQueries(0):
+            paginator = CachedCountPaginator(self.get_queryset(self.author), 5)
+            self.assertEqual(paginator.count, RECIPES)
+        self.assertFalse(paginator.count_is_approximate)
+        paginator = CachedCountPaginator(
+            self.get_queryset(self.user).filter(is_favorited=True), 5
+        )
+        self.assertEqual(paginator.count, RECIPES // 2)
+
+    def test_stale_count(self):
+        CachedCountPaginator(self.get_queryset(self.user), 5).count
+        for recipe in self.recipes[:2]:
+            recipe.pk = None
+            recipe.save()
+        paginator = CachedCountPaginator(self.get_queryset(self.user), 5)
+        self.assertEqual(paginator.count, RECIPES)
+        self.assertEqual(len(paginator.page(3)), 4)
+
+    @mock.patch('api.pagination.get_estimated_count', return_value=1000)
+    def test_approximate_count(self, get_estimated_count):
+        response = self.anonymous_client.get('/api/recipes/')
+        self.assertEqual(response.data['count'], 1000)
+        self.assertTrue(response.data['count_is_approximate'])
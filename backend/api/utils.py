@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.db.models import F
+
+from foodgram.settings import REFERENCE_CACHE_TIMEOUT
+from recipes.models import ShoppingListItem, Tag
+from users.models import Subscribe
+from .cache import get_cache_version
+
+
+def get_subscribed_author_ids(request):
+    """
+    Подписки текущего пользователя загружаются один раз за запрос
+    и используются всеми вложенными сериализаторами.
+    """
+    if not hasattr(request, '_subscribed_author_ids'):
+        request._subscribed_author_ids = set(
+            Subscribe.objects.filter(
+                user=request.user
+            ).values_list('author_id', flat=True)
+        )
+    return request._subscribed_author_ids
+
+
+def get_tag_ids():
+    """
+    Соответствие slug и id тегов, кешируется до изменения тегов.
+    """
+    key = f'tags:{get_cache_version("tags")}:ids'
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, REFERENCE_CACHE_TIMEOUT)
+    return tag_ids
+
+
+def get_shopping_cart_ingredients(user):
+    """
+    Продукты из списка покупок пользователя, суммы которых
+    поддерживаются при изменении корзины.
+    """
+    return (
+        ShoppingListItem.objects
+        .filter(user=user)
+        .values('ingredient__name', 'ingredient__measurement_unit',
+                total=F('amount'))
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+def shopping_cart_lines(ingredients):
+    """
+    Построчная выгрузка списка покупок.
+    """
+    for item in ingredients:
+        yield (
+            f'{item["ingredient__name"]} -- {item["total"]} '
+            f'{item["ingredient__measurement_unit"]}\n'
+        )
@@ -1,26 +1,30 @@
 from http import HTTPStatus
 
-from django.db import IntegrityError
-from django.http import HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from foodgram.settings import RECIPES_CACHE_TIMEOUT
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart, Tag)
 from users.models import Subscribe, User
 from .filters import IngredientFilter, RecipeFilter
 from .pagination import CustomPagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeCartSerializer, RecipeSerializer,
-                          RecipeSerializerPost, RecipeShortFieldSerializer,
-                          ShoppingCartSerializer, SubscribeSerializer,
-                          TagSerializer, UserSerializer)
-from .mixins import ListRetriveViewSet
+from .serializers import (FavoriteSerializer, FlatRecipeSerializer,
+                          IngredientSerializer, RecipeCartSerializer,
+                          RecipeSerializer, RecipeSerializerPost,
+                          RecipeShortFieldSerializer, ShoppingCartSerializer,
+                          SubscribeSerializer, TagSerializer, UserSerializer)
+from .mixins import ListRetriveViewSet, VersionedCacheMixin
+from .utils import get_shopping_cart_ingredients, shopping_cart_lines
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -40,8 +44,46 @@ class SubscribeViewSet(viewsets.ModelViewSet):
     permission_classes = (permissions.IsAuthenticated,)
     pagination_class = CustomPagination
 
+    def get_recipes_limit(self):
+        """
+        Проверка параметра recipes_limit.
+        """
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = -1
+        if recipes_limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'Должно быть целым неотрицательным числом.'}
+            )
+        return recipes_limit
+
     def get_queryset(self):
-        return Subscribe.objects.filter(user=self.request.user)
+        """
+        Рецепты всех авторов страницы загружаются одним запросом.
+        """
+        recipes = Recipe.objects.all()
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
+        return (
+            Subscribe.objects
+            .filter(user=self.request.user)
+            .select_related('author')
+            .prefetch_related(Prefetch(
+                'author__recipe_author',
+                queryset=recipes,
+                to_attr='limited_recipes'
+            ))
+            .order_by('-id')
+        )
 
     def create(self, request, *args, **kwargs):
         """
@@ -83,17 +125,69 @@ class SubscribeViewSet(viewsets.ModelViewSet):
         return Response(status=HTTPStatus.NO_CONTENT)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
     """
     Обработка моделей рецептов.
+    Ответы анонимным пользователям кешируются.
     """
-    queryset = Recipe.objects.all()
+    cache_name = 'recipes'
+    cache_timeout = RECIPES_CACHE_TIMEOUT
+    cache_anonymous_only = True
+    # Допустимое число запросов к базе на страницу списка
+    # или на один рецепт, не зависит от размера страницы.
+    query_budget = 7
     permission_classes = (IsAuthorOrReadOnly, )
     serializer_class = RecipeSerializer
     filter_class = RecipeFilter
     filter_backends = (DjangoFilterBackend, )
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        """
+        Автор, теги и продукты загружаются заранее, флаги избранного
+        и корзины вычисляются подзапросами сразу для всей страницы.
+        """
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'recipe_ingredient',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            ),
+        )
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(self.list_flat, request,
+                                        *args, **kwargs)
+
+    def list_flat(self, request, *args, **kwargs):
+        """
+        Список рецептов собирается FlatRecipeSerializer
+        из строк values() без создания моделей.
+        """
+        rows = FlatRecipeSerializer.get_rows(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(rows)
+        serializer = FlatRecipeSerializer(
+            rows if page is None else page,
+            context=self.get_serializer_context()
+        )
+        data = self.get_serializer_data(serializer)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
     def get_serializer_class(self):
         """
         Функция выбора сериализатора при разных запросах.
@@ -109,16 +203,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save(author=self.request.user)
 
 
-class IngredientViewSet(ListRetriveViewSet):
+class IngredientViewSet(VersionedCacheMixin, ListRetriveViewSet):
     """
     Обработка модели продуктов.
     """
+    cache_name = 'ingredients'
     queryset = Ingredient.objects.all()
     permission_classes = [permissions.AllowAny, ]
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (DjangoFilterBackend, IngredientFilter)
-    search_fields = ['^name', ]
+    filter_backends = (IngredientFilter, )
 
 
 class ShoppingCartViewSet(viewsets.ModelViewSet):
@@ -129,6 +223,7 @@ class ShoppingCartViewSet(viewsets.ModelViewSet):
     queryset = ShoppingCart.objects.all()
     permission_classes = (permissions.IsAuthenticated,)
 
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         recipe_id = self.kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
@@ -136,6 +231,7 @@ class ShoppingCartViewSet(viewsets.ModelViewSet):
         serializer = RecipeCartSerializer(recipe, many=False)
         return Response(data=serializer.data, status=HTTPStatus.CREATED)
 
+    @transaction.atomic
     def delete(self, request, *args, **kwargs):
         recipe_id = self.kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
@@ -171,10 +267,11 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         return Response(status=HTTPStatus.NO_CONTENT)
 
 
-class TagViewSet(ListRetriveViewSet):
+class TagViewSet(VersionedCacheMixin, ListRetriveViewSet):
     """
     Обработка моделей тегов.
     """
+    cache_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
@@ -182,26 +279,16 @@ class TagViewSet(ListRetriveViewSet):
 
 
 class DownloadShoppingCartViewSet(APIView):
+    """
+    Выгрузка списка покупок.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
     def get(self, request):
-        user = request.user
-        shopping_carts = ShoppingCart.objects.filter(user=user)
-        recipes = [cart.recipe for cart in shopping_carts]
-        cart_dict = {}
-        for recipe in recipes:
-            for ingredient in recipe.ingredients.all():
-                amount = get_object_or_404(IngredientInRecipe,
-                                           recipe=recipe,
-                                           ingredient=ingredient).amount
-                if ingredient.name not in cart_dict:
-                    cart_dict[ingredient.name] = amount
-                else:
-                    cart_dict[ingredient.name] += amount
-        content = ''
-        for item in cart_dict:
-            measurement_unit = get_object_or_404(Ingredient,
-                                                 name=item).measurement_unit
-            content += f'{item} -- {cart_dict[item]} {measurement_unit}\n'
-        response = HttpResponse(content,
-                                content_type='text/plain,charset=utf8')
+        ingredients = get_shopping_cart_ingredients(request.user)
+        response = StreamingHttpResponse(
+            shopping_cart_lines(ingredients.iterator()),
+            content_type='text/plain; charset=utf-8'
+        )
         response['Content-Disposition'] = 'attachment; filename="cart.txt"'
         return response
@@ -0,0 +1,45 @@
+"""
+Настройки gunicorn: приложение загружается и прогревается
+в мастер-процессе, кеши из базы заполняются в каждом воркере.
+
+Версии кешей должны быть общими для всех процессов, поэтому
+несколько воркеров по умолчанию запускаются только с общим кешем.
+"""
+import multiprocessing
+import os
+
+from foodgram.settings import CACHES
+
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+bind = os.getenv('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS',
+    default=(1 if CACHES['default']['BACKEND'] == LOCAL_CACHE_BACKEND
+             else multiprocessing.cpu_count() * 2 + 1)
+))
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default=1000))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    if (server.cfg.workers > 1
+            and CACHES['default']['BACKEND'] == LOCAL_CACHE_BACKEND):
+        server.log.warning(
+            'Воркеров: %s, но кеш локальный для каждого процесса, '
+            'изменения данных не будут видны в других воркерах. '
+            'Задайте общий кеш в CACHE_BACKEND.', server.cfg.workers
+        )
+
+
+def when_ready(server):
+    from foodgram.warmup import warm_up_process
+
+    warm_up_process()
+
+
+def post_fork(server, worker):
+    from foodgram.warmup import warm_up_worker
+
+    warm_up_worker()
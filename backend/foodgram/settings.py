@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
     'django_filters',
 ]
 
@@ -40,6 +41,33 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+REQUEST_METRICS = os.getenv('REQUEST_METRICS', default='False') == 'True'
+
+if REQUEST_METRICS:
+    MIDDLEWARE.insert(0, 'api.middleware.RequestMetricsMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'foodgram.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -98,6 +126,19 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            default='foodgram'
+        ),
+    }
+}
+
 AUTH_USER_MODEL = 'users.User'
 
 
@@ -127,14 +168,27 @@ USE_L10N = True
 
 USE_TZ = True
 
+FAST_JSON = os.getenv('FAST_JSON', default='True') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer' if FAST_JSON
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser' if FAST_JSON
+        else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
@@ -160,3 +214,35 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 PAGES = 6
+
+COUNT_CACHE_TIMEOUT = 30
+
+COUNT_ESTIMATE_THRESHOLD = 100000
+
+INGREDIENTS_SEARCH_LIMIT = 50
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+RECIPES_CACHE_TIMEOUT = 60 * 60
+
+JOBS_EAGER = os.getenv('JOBS_EAGER', default='False') == 'True'
+
+JOBS_MAX_ATTEMPTS = 3
+
+JOBS_RETRY_DELAY = 10
+
+JOBS_VISIBILITY_TIMEOUT = 5 * 60
+
+JOBS_DONE_RETENTION = 60 * 60 * 24 * 7
+
+JOBS_CLEANUP_INTERVAL = 60 * 60
+
+SLOW_REQUEST_THRESHOLD = int(
+    os.getenv('SLOW_REQUEST_THRESHOLD', default=500)
+)
+
+SLOW_REQUEST_QUERIES = 20
+
+SEARCH_CONFIG = 'russian'
+
+TOKEN_CACHE_TIMEOUT = 60
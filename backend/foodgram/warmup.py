@@ -0,0 +1,163 @@
+"""
+Прогрев процесса gunicorn, чтобы первые запросы после деплоя
+и перезапуска воркеров не тратили время на ленивую инициализацию.
+
+Подготовка без базы данных выполняется в мастер-процессе
+до fork и разделяется воркерами, заполнение кешей из базы
+выполняется в каждом воркере после fork.
+"""
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Эндпоинты для замера первых запросов и заполнения общих кешей.
+WARM_UP_PATHS = ('/api/tags/', '/api/ingredients/', '/api/recipes/')
+STARTUP_PATHS = ('/api/recipes/', '/api/tags/', '/api/ingredients/',
+                 '/api/users/')
+
+
+def walk_patterns(patterns):
+    """
+    Компиляция регулярных выражений всех маршрутов.
+    """
+    from django.urls import URLResolver
+
+    count = 0
+    for pattern in patterns:
+        # Обращение к regex компилирует и кеширует выражение маршрута.
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            count += walk_patterns(pattern.url_patterns)
+        else:
+            count += 1
+    return count
+
+
+def get_serializer_classes():
+    """
+    Сериализаторы API и djoser.
+    """
+    from djoser.conf import settings as djoser_settings
+    from rest_framework.serializers import BaseSerializer
+
+    from api import serializers
+
+    classes = {
+        value for value in vars(serializers).values()
+        if isinstance(value, type) and issubclass(value, BaseSerializer)
+        and value.__module__ == serializers.__name__
+    }
+    classes.update(
+        getattr(djoser_settings.SERIALIZERS, name)
+        for name in djoser_settings.SERIALIZERS
+    )
+    return classes
+
+
+def build_fields(serializer):
+    """
+    Построение полей сериализатора вместе с вложенными.
+    """
+    from rest_framework.serializers import BaseSerializer, ListSerializer
+
+    count = 0
+    for field in serializer.fields.values():
+        count += 1
+        if isinstance(field, ListSerializer):
+            field = field.child
+        if isinstance(field, BaseSerializer):
+            count += build_fields(field)
+    return count
+
+
+def warm_up_process():
+    """
+    Подготовка без обращений к базе: маршруты и сериализаторы.
+    """
+    from django.db import connections
+    from django.urls import get_resolver
+
+    start = time.perf_counter()
+    try:
+        resolver = get_resolver()
+        # Обращение к reverse_dict заполняет таблицу обратного разрешения.
+        resolver.reverse_dict
+        routes = walk_patterns(resolver.url_patterns)
+        fields = sum(
+            build_fields(serializer_class())
+            for serializer_class in get_serializer_classes()
+        )
+    except Exception:
+        logger.exception('Ошибка прогрева процесса')
+        return
+    finally:
+        connections.close_all()
+    logger.info('Прогрев процесса: %s маршрутов, %s полей за %.1f мс',
+                routes, fields, (time.perf_counter() - start) * 1000)
+
+
+def get_host():
+    from django.conf import settings
+
+    host = next(iter(settings.ALLOWED_HOSTS), 'localhost').lstrip('.')
+    return 'localhost' if host == '*' else host
+
+
+def warm_up_worker():
+    """
+    Заполнение кешей справочников и индекса продуктов из базы.
+    Ответы эндпоинтов кешируются вызовом представлений напрямую,
+    без тестового клиента и цепочки middleware.
+    """
+    from django.db import connections
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from api.indexes import ingredient_index
+    from api.utils import get_tag_ids
+
+    start = time.perf_counter()
+    try:
+        ingredient_index.get_data()
+        get_tag_ids()
+        factory = RequestFactory(HTTP_HOST=get_host())
+        for path in WARM_UP_PATHS:
+            response = resolve(path).func(factory.get(path))
+            response.render()
+    except Exception:
+        logger.exception('Ошибка прогрева воркера')
+        return
+    finally:
+        connections.close_all()
+    logger.info('Прогрев воркера %s за %.1f мс', os.getpid(),
+                (time.perf_counter() - start) * 1000)
+
+
+def measure_startup(warm_up):
+    """
+    Замер холодного старта, выполняется в отдельном процессе.
+    Печатает время загрузки приложения, прогрева и первых запросов.
+    """
+    start = time.perf_counter()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.core.wsgi import get_wsgi_application
+
+    get_wsgi_application()
+    from django.test import Client
+
+    result = {'load_ms': (time.perf_counter() - start) * 1000}
+    if warm_up:
+        begin = time.perf_counter()
+        warm_up_process()
+        warm_up_worker()
+        result['warm_up_ms'] = (time.perf_counter() - begin) * 1000
+    client = Client(HTTP_HOST=get_host())
+    for label in ('first', 'second'):
+        for path in STARTUP_PATHS:
+            begin = time.perf_counter()
+            client.get(path)
+            result[f'{label} {path}'] = (time.perf_counter() - begin) * 1000
+    print(json.dumps(result))
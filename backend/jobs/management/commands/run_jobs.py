@@ -0,0 +1,74 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from foodgram.settings import (JOBS_CLEANUP_INTERVAL, JOBS_DONE_RETENTION,
+                               JOBS_VISIBILITY_TIMEOUT)
+from jobs.queue import claim_job, delete_done_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default=1, type=int)
+        parser.add_argument('--visibility-timeout', type=int,
+                            default=JOBS_VISIBILITY_TIMEOUT)
+        parser.add_argument('--poll-interval', default=1.0, type=float)
+        parser.add_argument('--retention', default=JOBS_DONE_RETENTION,
+                            type=int,
+                            help='сколько секунд хранить выполненные задачи')
+        parser.add_argument('--once', action='store_true',
+                            help='выполнить готовые задачи и завершиться')
+
+    def work(self, options):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                job = claim_job(options['visibility_timeout'])
+                if job is None:
+                    self.cleanup(options['retention'])
+                    if options['once']:
+                        return
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+                started = time.monotonic()
+                result = 'ok' if run_job(job) else 'error'
+                self.stdout.write(
+                    f'{job.task} #{job.pk}: {result} '
+                    f'за {time.monotonic() - started:.3f} с'
+                )
+        finally:
+            connection.close()
+
+    def cleanup(self, retention):
+        """
+        Удаление старых выполненных задач, не чаще JOBS_CLEANUP_INTERVAL.
+        """
+        now = time.monotonic()
+        if now - self.cleaned_at < JOBS_CLEANUP_INTERVAL:
+            return
+        self.cleaned_at = now
+        deleted = delete_done_jobs(retention)
+        if deleted:
+            self.stdout.write(f'Удалено выполненных задач: {deleted}')
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def handle(self, *args, **options):
+        self.stopping = Event()
+        self.cleaned_at = float('-inf')
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            workers = [
+                executor.submit(self.work, options)
+                for _ in range(options['concurrency'])
+            ]
+        for worker in workers:
+            worker.result()
@@ -0,0 +1,70 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Модель фоновой задачи.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField(
+        verbose_name='Задача',
+        max_length=200,
+    )
+    payload = models.TextField(
+        verbose_name='Аргументы',
+        default='{}',
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name='Число попыток',
+        default=0,
+    )
+    max_attempts = models.PositiveIntegerField(
+        verbose_name='Максимум попыток',
+        default=3,
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Запустить после',
+        default=timezone.now,
+    )
+    locked_until = models.DateTimeField(
+        verbose_name='Занята до',
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True,
+    )
+    created = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        ordering = ('run_at', 'id')
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=('status', 'run_at'),
+                         name='job_status_run_at_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.task} ({self.status})'
@@ -0,0 +1,147 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from foodgram.settings import (JOBS_DONE_RETENTION, JOBS_EAGER,
+                               JOBS_MAX_ATTEMPTS, JOBS_RETRY_DELAY,
+                               JOBS_VISIBILITY_TIMEOUT)
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def task(func):
+    """
+    Регистрация функции как фоновой задачи.
+    Аргументы задачи передаются только по имени и должны сериализоваться в JSON.
+    """
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    func.delay = lambda **kwargs: enqueue(func, **kwargs)
+    return func
+
+
+def enqueue(func, max_attempts=JOBS_MAX_ATTEMPTS, delay=0, **kwargs):
+    """
+    Постановка задачи в очередь.
+    При JOBS_EAGER задача сохраняется занятой и сразу выполняется
+    через run_job: ошибка не выходит наружу, а оставляет задачу
+    в очереди на повтор или помечает её упавшей.
+    """
+    now = timezone.now()
+    job = Job(
+        task=func.task_name,
+        payload=json.dumps(kwargs),
+        max_attempts=max_attempts,
+        run_at=now + timedelta(seconds=delay),
+    )
+    if not JOBS_EAGER:
+        job.save()
+        return job
+    job.status = Job.RUNNING
+    job.attempts = 1
+    job.locked_until = now + timedelta(seconds=JOBS_VISIBILITY_TIMEOUT)
+    job.save()
+    run_job(job)
+    job.refresh_from_db()
+    return job
+
+
+def get_task(name):
+    func = import_string(name)
+    if getattr(func, 'task_name', None) != name:
+        raise ValueError(f'{name} не зарегистрирована как задача')
+    return func
+
+
+def claim_job(visibility_timeout=JOBS_VISIBILITY_TIMEOUT):
+    """
+    Захват одной готовой задачи.
+    Задача занимается условным UPDATE, поэтому её не возьмут
+    два обработчика одновременно. Задачи упавших обработчиков
+    становятся доступны после истечения locked_until,
+    если попытки ещё не исчерпаны.
+    """
+    now = timezone.now()
+    expired = Q(status=Job.RUNNING, locked_until__lt=now)
+    Job.objects.filter(
+        expired, attempts__gte=F('max_attempts')
+    ).update(status=Job.FAILED, locked_until=None,
+             last_error='Истекло время выполнения')
+    claimable = (
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | (expired & Q(attempts__lt=F('max_attempts')))
+    )
+    candidates = Job.objects.filter(claimable).values_list('pk', flat=True)
+    for pk in candidates[:10]:
+        claimed = Job.objects.filter(claimable, pk=pk).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """
+    Выполнение задачи с повтором при ошибке.
+    Статус меняется, только пока задача занята этим обработчиком:
+    после истечения locked_until её мог захватить другой.
+    """
+    owned = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, attempts=job.attempts,
+        locked_until=job.locked_until
+    )
+    try:
+        get_task(job.task)(**json.loads(job.payload))
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s #%s завершилась ошибкой', job.task, job.pk)
+        if job.attempts >= job.max_attempts:
+            owned.update(
+                status=Job.FAILED, locked_until=None, last_error=error
+            )
+        else:
+            owned.update(
+                status=Job.QUEUED,
+                locked_until=None,
+                last_error=error,
+                run_at=timezone.now() + timedelta(
+                    seconds=JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+                ),
+            )
+        return False
+    if not owned.update(status=Job.DONE, locked_until=None):
+        logger.warning('Задача %s #%s уже захвачена другим обработчиком',
+                       job.task, job.pk)
+    return True
+
+
+def delete_done_jobs(retention=JOBS_DONE_RETENTION):
+    """
+    Удаление выполненных задач старше retention секунд.
+    """
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        created__lt=timezone.now() - timedelta(seconds=retention),
+    ).delete()
+    return deleted
+
+
+def run_pending(visibility_timeout=JOBS_VISIBILITY_TIMEOUT):
+    """
+    Выполнение всех готовых задач, возвращает их число.
+    """
+    processed = 0
+    while True:
+        job = claim_job(visibility_timeout)
+        if job is None:
+            return processed
+        run_job(job)
+        processed += 1
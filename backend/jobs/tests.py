@@ -0,0 +1,119 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_job, enqueue, run_job, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task
+def fail(value):
+    raise ValueError(value)
+
+
+class JobQueueTest(TestCase):
+    """
+    Захват, выполнение и повтор фоновых задач.
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def create_job(self, func, **kwargs):
+        return enqueue(func, value=1, **kwargs)
+
+    def expire(self, job, attempts):
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=attempts,
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_claim_job(self):
+        job = self.create_job(record)
+        self.create_job(record, delay=60)
+        claimed = claim_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertGreater(claimed.locked_until, timezone.now())
+        self.assertIsNone(claim_job())
+
+    def test_claim_expired_job(self):
+        job = self.create_job(record)
+        self.expire(job, attempts=1)
+        claimed = claim_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_expired_job_without_attempts_fails(self):
+        job = self.create_job(record)
+        self.expire(job, attempts=job.max_attempts)
+        self.assertIsNone(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(job.locked_until)
+
+    def test_run_job(self):
+        self.create_job(record)
+        job = claim_job()
+        self.assertTrue(run_job(job))
+        self.assertEqual(calls, [1])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNone(job.locked_until)
+
+    def test_run_job_after_ownership_lost(self):
+        self.create_job(record)
+        job = claim_job()
+        self.expire(job, attempts=job.attempts)
+        reclaimed = claim_job()
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertTrue(run_job(job))
+        reclaimed.refresh_from_db()
+        self.assertEqual(reclaimed.status, Job.RUNNING)
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def test_failed_job_is_retried(self):
+        self.create_job(fail, max_attempts=2)
+        job = claim_job()
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('ValueError', job.last_error)
+        self.assertIsNone(claim_job())
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job = claim_job()
+        self.assertEqual(job.attempts, 2)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    @mock.patch('jobs.queue.JOBS_EAGER', True)
+    def test_eager(self):
+        job = self.create_job(record)
+        self.assertEqual(calls, [1])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    @mock.patch('jobs.queue.JOBS_EAGER', True)
+    def test_eager_failure(self):
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            job = self.create_job(fail)
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('ValueError', job.last_error)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            job = self.create_job(fail, max_attempts=1)
+        self.assertEqual(job.status, Job.FAILED)
@@ -4,6 +4,7 @@ from users.models import Subscribe, User
 from .forms import RecipeFormset
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                      ShoppingCart, Tag, TagRecipe)
+from .shopping_list import change_recipe_ingredients, get_recipe_amounts
 
 
 class UserAdmin(admin.ModelAdmin):
@@ -41,11 +42,22 @@ class RecipeAdmin(admin.ModelAdmin):
 
     def count_all_in_favorite(self, obj):
         """
-        Подсчёт общего числа добавлений
+        Общее число добавлений
         этого рецепта в избранное.
         """
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
     count_all_in_favorite.text = 'Число добавлений в избранное.'
+    count_all_in_favorite.admin_order_field = 'favorites_count'
+
+    def save_related(self, request, form, formsets, change):
+        """
+        Изменения продуктов рецепта переносятся в списки покупок.
+        """
+        old_amounts = get_recipe_amounts(form.instance.pk) if change else {}
+        super().save_related(request, form, formsets, change)
+        if change:
+            change_recipe_ingredients(form.instance.pk, old_amounts,
+                                      get_recipe_amounts(form.instance.pk))
 
 
 class TagAdmin(admin.ModelAdmin):
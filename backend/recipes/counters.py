@@ -0,0 +1,37 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    """
+    Подзапрос числа строк model, ссылающихся на внешнюю строку через field.
+    """
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def recount_counters(apps):
+    """
+    Пересчёт всех счётчиков одним UPDATE на таблицу.
+    """
+    recipe = apps.get_model('recipes', 'Recipe')
+    favorite = apps.get_model('recipes', 'Favorite')
+    user = apps.get_model('users', 'User')
+    subscribe = apps.get_model('users', 'Subscribe')
+    recipe.objects.update(
+        favorites_count=count_subquery(favorite, 'recipe')
+    )
+    user.objects.update(
+        recipes_count=count_subquery(recipe, 'author'),
+        followers_count=count_subquery(subscribe, 'author'),
+    )
@@ -0,0 +1,72 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+
+from PIL import Image
+
+THUMBNAILS_DIR = 'thumbnails'
+# Размеры по большей стороне, None - исходный размер в формате WebP.
+THUMBNAIL_SIZES = {
+    'small': 240,
+    'card': 720,
+    'webp': None,
+}
+WEBP_QUALITY = 80
+
+
+def get_variant_name(name, size):
+    """
+    Путь варианта картинки определяется только её именем,
+    в базе хранится только признак того, что варианты созданы.
+    """
+    base = os.path.splitext(os.path.basename(name))[0]
+    return f'{THUMBNAILS_DIR}/{base}_{size}.webp'
+
+
+def get_variant_url(image, size, ready, storage=None):
+    """
+    Ссылка на вариант картинки или на оригинал, если варианты ещё
+    не созданы. Вместо файла поля модели можно передать имя файла
+    и хранилище.
+    """
+    if storage is None:
+        image, storage = image.name, image.storage
+    if ready:
+        return storage.url(get_variant_name(image, size))
+    return storage.url(image)
+
+
+def delete_variants(name, storage):
+    for size in THUMBNAIL_SIZES:
+        storage.delete(get_variant_name(name, size))
+
+
+def make_variants(image):
+    """
+    Создание уменьшенных копий и WebP-версии картинки рецепта.
+    Уже существующие варианты не пересоздаются.
+    Возвращает True, если был создан хотя бы один вариант.
+    """
+    storage = image.storage
+    missing = {
+        size: max_side for size, max_side in THUMBNAIL_SIZES.items()
+        if not storage.exists(get_variant_name(image.name, size))
+    }
+    if not missing:
+        return False
+    with image.open('rb'), Image.open(image) as source:
+        source.load()
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert(
+                'RGBA' if 'transparency' in source.info else 'RGB'
+            )
+        for size, max_side in missing.items():
+            variant = source.copy()
+            if max_side is not None:
+                variant.thumbnail((max_side, max_side), Image.LANCZOS)
+            buffer = BytesIO()
+            variant.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+            storage.save(get_variant_name(image.name, size),
+                         ContentFile(buffer.getvalue()))
+    return True
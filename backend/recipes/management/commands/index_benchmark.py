@@ -0,0 +1,142 @@
+import random
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.state import ProjectState
+
+from recipes.management.seed import seed_dataset
+from recipes.models import (Favorite, IngredientInRecipe, Recipe, ShoppingCart,
+                            TagRecipe)
+
+# Индексы и ограничения, добавленные в 0004_composite_indexes.
+MEASURED_INDEXES = (
+    (Favorite, 'favorite_recipe_user_idx'),
+    (Recipe, 'recipe_author_pub_date_idx'),
+    (ShoppingCart, 'cart_recipe_user_idx'),
+)
+MEASURED_CONSTRAINTS = (
+    (IngredientInRecipe, 'unique_ingredient_in_recipe'),
+    (TagRecipe, 'unique_tag_recipe'),
+)
+
+
+def get_by_name(items, name):
+    return next(item for item in items if item.name == name)
+
+
+def drop_indexes():
+    """
+    Удаление замеряемых индексов и ограничений.
+    SQLite удаляет ограничение пересозданием таблицы, поэтому
+    берётся модель из состояния миграций без этого ограничения.
+    """
+    state = ProjectState.from_apps(apps)
+    for model, name in MEASURED_CONSTRAINTS:
+        options = state.models[
+            model._meta.app_label, model._meta.model_name
+        ].options
+        options['constraints'] = [
+            constraint for constraint in options['constraints']
+            if constraint.name != name
+        ]
+    with connection.schema_editor() as schema_editor:
+        for model, name in MEASURED_INDEXES:
+            schema_editor.remove_index(
+                model, get_by_name(model._meta.indexes, name)
+            )
+        for model, name in MEASURED_CONSTRAINTS:
+            schema_editor.remove_constraint(
+                state.apps.get_model(model._meta.label),
+                get_by_name(model._meta.constraints, name)
+            )
+
+
+def create_indexes():
+    with connection.schema_editor() as schema_editor:
+        for model, name in MEASURED_INDEXES:
+            schema_editor.add_index(
+                model, get_by_name(model._meta.indexes, name)
+            )
+        for model, name in MEASURED_CONSTRAINTS:
+            schema_editor.add_constraint(
+                model, get_by_name(model._meta.constraints, name)
+            )
+
+
+def get_queries(rng, data):
+    """
+    Запросы горячих путей со случайными параметрами.
+    """
+    recipe_id = rng.choice(data['recipes'])
+    return {
+        'ingredient_in_recipe': IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id,
+            ingredient_id=rng.choice(data['ingredients'])
+        ),
+        'tag_recipe': TagRecipe.objects.filter(
+            recipe_id=recipe_id, tag_id=rng.choice(data['tags'])
+        ),
+        'author_recipes': Recipe.objects.filter(
+            author_id=rng.choice(data['users'])
+        ).order_by('-pub_date')[:6],
+        'recipe_favorites': Favorite.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        'recipe_carts': ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сравнение планов и времени запросов с составными индексами '
+            'и без них на временной базе с синтетическими данными')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=1000, type=int)
+        parser.add_argument('--recipes', default=100000, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=10, type=int)
+        parser.add_argument('--repeat', default=200, type=int)
+
+    def measure(self, data, repeat):
+        rng = random.Random(0)
+        plans = {
+            name: queryset.explain()
+            for name, queryset in get_queries(rng, data).items()
+        }
+        timings = dict.fromkeys(plans, 0.0)
+        for _ in range(repeat):
+            for name, queryset in get_queries(rng, data).items():
+                start = time.perf_counter()
+                list(queryset)
+                timings[name] += time.perf_counter() - start
+        return {
+            name: (plans[name], timings[name] / repeat * 1000)
+            for name in plans
+        }
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write('Заполнение временной базы...')
+            data = seed_dataset(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients_per_recipe=options['ingredients_per_recipe'],
+                log=self.stdout.write,
+            )
+            drop_indexes()
+            before = self.measure(data, options['repeat'])
+            create_indexes()
+            after = self.measure(data, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        for name in after:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f'  без индексов: {before[name][1]:.3f} мс')
+            self.stdout.write(f'    {before[name][0]}')
+            self.stdout.write(f'  с индексами: {after[name][1]:.3f} мс')
+            self.stdout.write(f'    {after[name][0]}')
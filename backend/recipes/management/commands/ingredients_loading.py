@@ -3,11 +3,53 @@ import os
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.db.utils import IntegrityError
+from django.db import transaction
 
+from api.cache import bump_cache_version
 from recipes.models import Ingredient
 
 DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+READ_SIZE = 64 * 1024
+
+
+def iter_json_array(file, read_size=READ_SIZE):
+    """
+    Потоковое чтение элементов JSON-массива без загрузки файла целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив')
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Некорректный JSON')
+            chunk = file.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def parse_ingredient(item):
+    """
+    Поддерживаются записи вида {"name", "measurement_unit"}
+    и фикстуры вида {"model": "*.ingredient", "fields": {...}}.
+    """
+    if 'fields' in item:
+        if not item.get('model', '').endswith('.ingredient'):
+            return None
+        item = item['fields']
+    return Ingredient(name=item['name'],
+                      measurement_unit=item['measurement_unit'])
 
 
 class Command(BaseCommand):
@@ -16,21 +58,37 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.json', nargs='?',
                             type=str)
+        parser.add_argument('--batch-size', default=1000, type=int)
+
+    def load_batch(self, batch):
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
 
     def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        read = 0
+        before = Ingredient.objects.count()
         try:
             with open(os.path.join(DATA_ROOT, options['filename']), 'r',
                       encoding='utf-8') as f:
-                data = json.load(f)
-                for ingredient in data:
-                    try:
-                        Ingredient.objects.create(name=ingredient["name"],
-                                                  measurement_unit=ingredient[
-                                                      "measurement_unit"])
-                    except IntegrityError:
-                        print(f'Ингридиет {ingredient["name"]} '
-                              f'{ingredient["measurement_unit"]} '
-                              f'уже есть в базе')
-
+                for item in iter_json_array(f):
+                    ingredient = parse_ingredient(item)
+                    if ingredient is None:
+                        continue
+                    batch.append(ingredient)
+                    read += 1
+                    if len(batch) >= batch_size:
+                        self.load_batch(batch)
+                        batch = []
+                        self.stdout.write(f'Обработано {read} ингредиентов')
         except FileNotFoundError:
             raise CommandError('Файл отсутствует в директории data')
+        if batch:
+            self.load_batch(batch)
+        bump_cache_version('ingredients')
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано {read}, добавлено {created}, '
+            f'уже были в базе {read - created}'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_cache_version
+from recipes.images import make_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'create missing thumbnails and webp variants of recipe images'
+
+    def handle(self, *args, **options):
+        processed = 0
+        for recipe in Recipe.objects.exclude(image='').only('image').iterator():
+            try:
+                make_variants(recipe.image)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{recipe.image.name}: {error}')
+                continue
+            Recipe.objects.filter(
+                pk=recipe.pk, image=recipe.image.name
+            ).update(thumbnails_ready=True)
+            processed += 1
+        if processed:
+            bump_cache_version('recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed}'
+        ))
@@ -0,0 +1,15 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = 'recount favorites, recipes and followers counters'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount_counters(apps)
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
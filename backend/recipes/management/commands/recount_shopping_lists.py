@@ -0,0 +1,15 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.shopping_list import recount_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'rebuild aggregated shopping lists from shopping carts'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount_shopping_lists(apps)
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS('Списки покупок пересчитаны'))
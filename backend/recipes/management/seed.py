@@ -0,0 +1,110 @@
+import random
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
+from recipes.search import rebuild_search_index
+from users.models import Subscribe, User
+
+BATCH_SIZE = 10000
+
+
+def bulk_insert(model, objects, log=None, batch_size=BATCH_SIZE):
+    """
+    Вставка объектов пачками без накопления всех объектов в памяти.
+    """
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            break
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    if log is not None:
+        log(f'{model.__name__}: {total}')
+    return total
+
+
+def seed_dataset(users=1000, recipes=100000, ingredients=2000, tags=10,
+                 ingredients_per_recipe=10, tags_per_recipe=2,
+                 favorites_per_user=100, carts_per_user=10,
+                 subscriptions_per_user=20, seed=0, log=None):
+    """
+    Заполнение пустой базы синтетическими данными.
+    Идентификаторы берутся из базы, поэтому база должна быть пустой.
+    """
+    rng = random.Random(seed)
+    password = make_password('benchmark')
+
+    bulk_insert(User, (
+        User(email=f'user{i}@example.com', username=f'user{i}',
+             first_name='Имя', last_name='Фамилия', password=password)
+        for i in range(users)
+    ), log)
+    user_ids = list(User.objects.values_list('id', flat=True))
+
+    bulk_insert(Ingredient, (
+        Ingredient(name=f'продукт {i}', measurement_unit='г')
+        for i in range(ingredients)
+    ), log)
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+
+    bulk_insert(Tag, (
+        Tag(name=f'тег {i}', color=f'#{i:06x}', slug=f'tag{i}')
+        for i in range(tags)
+    ), log)
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    bulk_insert(Recipe, (
+        Recipe(author_id=rng.choice(user_ids), name=f'рецепт {i}',
+               text='Описание рецепта', cooking_time=rng.randint(1, 120),
+               image='seed.png')
+        for i in range(recipes)
+    ), log)
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+
+    bulk_insert(IngredientInRecipe, (
+        IngredientInRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                           amount=rng.randint(1, 500))
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(
+            ingredient_ids, min(ingredients_per_recipe, len(ingredient_ids)))
+    ), log)
+    bulk_insert(TagRecipe, (
+        TagRecipe(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rng.sample(tag_ids, min(tags_per_recipe, len(tag_ids)))
+    ), log)
+    bulk_insert(Favorite, (
+        Favorite(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rng.sample(
+            recipe_ids, min(favorites_per_user, len(recipe_ids)))
+    ), log)
+    bulk_insert(ShoppingCart, (
+        ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rng.sample(
+            recipe_ids, min(carts_per_user, len(recipe_ids)))
+    ), log)
+    bulk_insert(Subscribe, (
+        Subscribe(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(
+            user_ids, min(subscriptions_per_user + 1, len(user_ids)))
+        if author_id != user_id
+    ), log)
+    call_command('recount_counters', verbosity=0)
+    call_command('recount_shopping_lists', verbosity=0)
+    rebuild_search_index(connection)
+    return {
+        'users': user_ids,
+        'recipes': recipe_ids,
+        'ingredients': ingredient_ids,
+        'tags': tag_ids,
+    }
@@ -0,0 +1,72 @@
+# Generated by Django 2.2.19 on 2026-10-18 06:22
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def delete_duplicates(apps, schema_editor):
+    """
+    Повторы продукта в рецепте, в том числе после слияния продуктов
+    в 0003, объединяются с суммой количеств, повторы тегов удаляются.
+    """
+    ingredient_in_recipe = apps.get_model('recipes', 'IngredientInRecipe')
+    duplicates = (
+        ingredient_in_recipe.objects
+        .values('recipe', 'ingredient')
+        .annotate(keep_id=Min('id'), total=Count('id'),
+                  amount=Sum('amount'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        ingredient_in_recipe.objects.filter(id=duplicate['keep_id']).update(
+            amount=duplicate['amount']
+        )
+        ingredient_in_recipe.objects.filter(
+            recipe=duplicate['recipe'], ingredient=duplicate['ingredient']
+        ).exclude(id=duplicate['keep_id']).delete()
+    tag_recipe = apps.get_model('recipes', 'TagRecipe')
+    duplicates = (
+        tag_recipe.objects
+        .values('recipe', 'tag')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        tag_recipe.objects.filter(
+            recipe=duplicate['recipe'], tag=duplicate['tag']
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+    # Удаление повторов и создание ограничений в разных транзакциях,
+    # как в 0003.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0003_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop,
+                             atomic=True),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['recipe', 'user'], name='favorite_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['recipe', 'user'], name='cart_recipe_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientinrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_ingredient_in_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'tag'), name='unique_tag_recipe'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.19 on 2026-10-18 06:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name_plural': 'Рецепты'},
+        ),
+    ]
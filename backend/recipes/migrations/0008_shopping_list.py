@@ -0,0 +1,56 @@
+# Generated by Django 2.2.19 on 2026-10-18 06:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    """
+    Суммирование продуктов из корзин в списки покупок.
+    """
+    item = apps.get_model('recipes', 'ShoppingListItem')
+    ingredient_in_recipe = apps.get_model('recipes', 'IngredientInRecipe')
+    rows = (
+        ingredient_in_recipe.objects
+        .filter(recipe__carts__isnull=False)
+        .values('recipe__carts__user_id', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .iterator()
+    )
+    item.objects.bulk_create(
+        item(user_id=row['recipe__carts__user_id'],
+             ingredient_id=row['ingredient_id'], amount=row['total'])
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0007_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(default=0, verbose_name='Количество продукта')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.Ingredient', verbose_name='Продукт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Продукт в списке покупок',
+                'verbose_name_plural': 'Список покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-18 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_shopping_list'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Варианты картинки созданы'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import MinValueValidator
 
@@ -45,11 +47,28 @@ class Ingredient(models.Model):
 
     class Meta:
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(fields=('name', 'measurement_unit'),
+                                    name='unique_ingredient')
+        ]
 
     def __str__(self):
         return self.name[:15]
 
 
+class SearchVectorIndex(GinIndex):
+    """
+    GIN-индекс поискового вектора в Postgres.
+    В других базах создаётся обычный индекс, поиск там идёт
+    по отдельной таблице FTS5.
+    """
+
+    def create_sql(self, model, schema_editor, using=''):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().create_sql(model, schema_editor, using)
+        return models.Index.create_sql(self, model, schema_editor, using)
+
+
 class Recipe(models.Model):
     """
     Модель рецептов.
@@ -86,10 +105,31 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    favorites_count = models.PositiveIntegerField(
+        'Число добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    thumbnails_ready = models.BooleanField(
+        'Варианты картинки созданы',
+        default=False,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=('author', '-pub_date'),
+                         name='recipe_author_pub_date_idx'),
+            SearchVectorIndex(fields=('search_vector',),
+                              name='recipe_search_vector_idx'),
+        ]
 
     def __str__(self):
         return self.name[:15]
@@ -117,6 +157,10 @@ class IngredientInRecipe(models.Model):
 
     class Meta:
         verbose_name = 'Продукты в рецепте'
+        constraints = [
+            models.UniqueConstraint(fields=('recipe', 'ingredient'),
+                                    name='unique_ingredient_in_recipe')
+        ]
 
     def __str__(self):
         return f'{self.ingredient} {self.recipe}'
@@ -146,6 +190,10 @@ class ShoppingCart(models.Model):
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique_cart')
         ]
+        indexes = [
+            models.Index(fields=('recipe', 'user'),
+                         name='cart_recipe_user_idx')
+        ]
 
     def __str__(self):
         return self.user.username
@@ -172,6 +220,10 @@ class Favorite(models.Model):
         verbose_name = 'Избранное'
         constraints = [models.UniqueConstraint(fields=('user', 'recipe'),
                        name='unique_favorite')]
+        indexes = [
+            models.Index(fields=('recipe', 'user'),
+                         name='favorite_recipe_user_idx')
+        ]
 
     def __str__(self):
         return f'{self.user} likes {self.recipe}'
@@ -193,6 +245,45 @@ class TagRecipe(models.Model):
 
     class Meta:
         verbose_name = 'Теги рецепта'
+        constraints = [
+            models.UniqueConstraint(fields=('recipe', 'tag'),
+                                    name='unique_tag_recipe')
+        ]
 
     def __str__(self):
         return f'{self.tag} {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Модель итогового списка покупок.
+    Суммы продуктов из рецептов корзины обновляются сигналами
+    при изменении корзины и продуктов рецептов.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Продукт',
+    )
+    amount = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество продукта',
+    )
+
+    class Meta:
+        verbose_name = 'Продукт в списке покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'ingredient'),
+                                    name='unique_shopping_list_item')
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} {self.amount}'
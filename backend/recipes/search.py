@@ -0,0 +1,100 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from foodgram.settings import SEARCH_CONFIG
+
+# Полнотекстовый индекс SQLite, rowid строки равен id рецепта.
+FTS_TABLE = 'recipes_recipe_fts'
+FTS_WEIGHTS = (10.0, 1.0)
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector(%s::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector(%s::regconfig, coalesce(text, '')), 'B')"
+)
+
+
+def rebuild_search_index(connection):
+    """
+    Переиндексация всех рецептов, нужна после массовой вставки.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE recipes_recipe SET search_vector = {POSTGRES_VECTOR}',
+                [SEARCH_CONFIG, SEARCH_CONFIG]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                f'SELECT id, name, text FROM recipes_recipe'
+            )
+
+
+def update_search_index(recipe, using='default'):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE recipes_recipe SET search_vector = {POSTGRES_VECTOR} '
+                f'WHERE id = %s',
+                [SEARCH_CONFIG, SEARCH_CONFIG, recipe.pk]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [recipe.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                f'VALUES (%s, %s, %s)',
+                [recipe.pk, recipe.name, recipe.text]
+            )
+
+
+def delete_from_search_index(recipe_id, using='default'):
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [recipe_id])
+
+
+def get_fts_query(text):
+    """
+    Слова запроса как фразы FTS5 с поиском по началу слова,
+    чтобы операторы и кавычки из запроса не ломали синтаксис.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def search_recipes(queryset, text):
+    """
+    Рецепты, подходящие под запрос, по убыванию релевантности
+    в аннотации search_rank.
+    """
+    vendor = connections[queryset.db].vendor
+    ordering = ('-search_rank', *queryset.model._meta.ordering)
+    if vendor == 'postgresql':
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by(*ordering)
+    if vendor == 'sqlite':
+        match = get_fts_query(text)
+        if not match:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        # RawSQL в id__in оборачивается в скобки и становится скалярным
+        # подзапросом, поэтому рецепты без совпадений отсекаются
+        # по пустому рангу.
+        return queryset.annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, %s, %s) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = {table}.id',
+            [*FTS_WEIGHTS, match], output_field=FloatField()
+        )).filter(search_rank__isnull=False).order_by(*ordering)
+    return queryset.filter(
+        Q(name__icontains=text) | Q(text__icontains=text)
+    )
@@ -0,0 +1,97 @@
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+
+def get_recipe_amounts(recipe_id):
+    return dict(
+        IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+def get_amount_changes(old, new):
+    """
+    Разница количеств продуктов до и после изменения рецепта.
+    """
+    changes = {
+        ingredient_id: amount - old.get(ingredient_id, 0)
+        for ingredient_id, amount in new.items()
+    }
+    changes.update(
+        (ingredient_id, -amount) for ingredient_id, amount in old.items()
+        if ingredient_id not in new
+    )
+    return changes
+
+
+def change_shopping_lists(user_ids, changes):
+    """
+    Изменение сумм продуктов в списках покупок пользователей
+    одним UPDATE, строки с нулевой суммой удаляются.
+    """
+    changes = {
+        ingredient_id: amount for ingredient_id, amount in changes.items()
+        if amount
+    }
+    user_ids = list(user_ids)
+    if not changes or not user_ids:
+        return
+    added = [
+        ingredient_id for ingredient_id, amount in changes.items() if amount > 0
+    ]
+    if added:
+        ShoppingListItem.objects.bulk_create((
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids for ingredient_id in added
+        ), ignore_conflicts=True)
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+    items.filter(ingredient_id__in=changes).update(amount=Greatest(
+        F('amount') + Case(
+            *(When(ingredient_id=ingredient_id, then=Value(amount))
+              for ingredient_id, amount in changes.items()),
+            default=Value(0), output_field=IntegerField()
+        ),
+        Value(0)
+    ))
+    if len(added) < len(changes):
+        items.filter(ingredient_id__in=changes, amount=0).delete()
+
+
+def change_recipe_ingredients(recipe_id, old, new):
+    """
+    Перенос изменений продуктов рецепта в списки покупок
+    пользователей, у которых рецепт в корзине.
+    """
+    changes = get_amount_changes(old, new)
+    if any(changes.values()):
+        change_shopping_lists(
+            ShoppingCart.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('user_id', flat=True),
+            changes
+        )
+
+
+def recount_shopping_lists(apps):
+    """
+    Пересборка всех списков покупок по корзинам.
+    """
+    item = apps.get_model('recipes', 'ShoppingListItem')
+    ingredient_in_recipe = apps.get_model('recipes', 'IngredientInRecipe')
+    item.objects.all().delete()
+    rows = (
+        ingredient_in_recipe.objects
+        .filter(recipe__carts__isnull=False)
+        .values('recipe__carts__user_id', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .iterator()
+    )
+    item.objects.bulk_create(
+        item(user_id=row['recipe__carts__user_id'],
+             ingredient_id=row['ingredient_id'], amount=row['total'])
+        for row in rows
+    )
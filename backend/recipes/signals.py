@@ -0,0 +1,134 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from users.models import Subscribe, User
+from .images import delete_variants
+from .models import Favorite, Recipe, ShoppingCart
+from .search import delete_from_search_index, update_search_index
+from .shopping_list import change_shopping_lists, get_recipe_amounts
+from .tasks import make_image_variants
+
+
+def change_counter(model, pk, field, delta):
+    """
+    Атомарное изменение счётчика без чтения строки.
+    """
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribe_created(instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscribe_deleted(instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)
+
+
+def get_image_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+def image_changed(instance, update_fields):
+    if update_fields is not None and 'image' not in update_fields:
+        return False
+    return get_image_name(instance.image) != instance._saved_image
+
+
+def delete_image_variants(name):
+    storage = Recipe._meta.get_field('image').storage
+    transaction.on_commit(lambda: delete_variants(name, storage))
+
+
+@receiver(post_init, sender=Recipe)
+def recipe_image_loaded(instance, **kwargs):
+    instance._saved_image = get_image_name(instance.__dict__.get('image'))
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_image_changing(instance, update_fields, **kwargs):
+    if not instance._state.adding and image_changed(instance, update_fields):
+        instance.thumbnails_ready = False
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(instance, created, update_fields, **kwargs):
+    """
+    Варианты создаются только для новой или заменённой картинки,
+    варианты заменённой картинки удаляются.
+    """
+    if not created and not image_changed(instance, update_fields):
+        return
+    if not created and instance._saved_image:
+        delete_image_variants(instance._saved_image)
+    instance._saved_image = instance.image.name
+    if instance.image:
+        transaction.on_commit(
+            lambda: make_image_variants.delay(recipe_id=instance.pk)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(instance, **kwargs):
+    if instance.image:
+        delete_image_variants(instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_saved(instance, using, update_fields, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        update_search_index(instance, using)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_deleted(instance, using, **kwargs):
+    delete_from_search_index(instance.pk, using)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_created(instance, created, **kwargs):
+    if created:
+        change_shopping_lists([instance.user_id],
+                              get_recipe_amounts(instance.recipe_id))
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def cart_deleted(instance, **kwargs):
+    """
+    При удалении рецепта его продукты могут удаляться раньше корзин,
+    поэтому суммы вычитаются до удаления.
+    """
+    change_shopping_lists([instance.user_id], {
+        ingredient_id: -amount for ingredient_id, amount
+        in get_recipe_amounts(instance.recipe_id).items()
+    })
@@ -0,0 +1,21 @@
+from api.cache import bump_cache_version
+from jobs.queue import task
+from .images import make_variants
+from .models import Recipe
+
+
+@task
+def make_image_variants(recipe_id):
+    """
+    Создание вариантов картинки рецепта в фоне.
+    Кеш рецептов сбрасывается, только когда ссылки переключаются
+    на варианты. Если картинку успели заменить, признак не ставится.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    make_variants(recipe.image)
+    if Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name, thumbnails_ready=False
+    ).update(thumbnails_ready=True):
+        bump_cache_version('recipes')